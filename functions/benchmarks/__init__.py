@@ -0,0 +1 @@
+"""Offline benchmarks for the exam parsing pipeline (not deployed)."""
@@ -0,0 +1,96 @@
+"""
+Compares the Firestore size of parsed sample reports stored in the plain
+layout (df.to_dict(orient="list")) and in the compact columnar layout of
+src.compact, and checks that the compact one decodes back to the same
+document. Sizes follow Firestore's storage size rules, against the 1 MiB
+document limit.
+
+Usage (from the functions directory):
+    python -m benchmarks.encoding
+"""
+
+import contextlib
+import os
+import time
+from datetime import datetime
+from typing import Any
+
+from src.compact import codifica_documento, decodifica_documento
+from src.utils import get_document_from_pdf_exam
+
+from benchmarks.synthetic import make_evolutive_report
+
+FIRESTORE_MAX_DOCUMENT = 1_048_576
+DOCUMENT_OVERHEAD = 32
+REFERENCES = [
+    "De 70 a 99 mg/dL",
+    "Inferior a 200 mg/dL",
+    "Até 40 U/L",
+    "Maior que 60 mL/min",
+    "< 5,0 %",
+    "Negativo",
+]
+SAMPLES = [(1, 3, 20), (4, 6, 30), (8, 12, 30), (16, 24, 40)]  # páginas, datas, linhas
+
+
+def tamanho_firestore(value: Any) -> int:
+    """
+    This function computes the storage size of a value by Firestore's rules:
+    strings take their UTF-8 length plus 1 byte, numbers and timestamps
+    8 bytes, booleans and nulls 1 byte, and maps the size of their keys
+    (as strings) plus the size of their values.
+    """
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, int | float | datetime):
+        return 8
+    if isinstance(value, str):
+        return len(value.encode()) + 1
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(
+            tamanho_firestore(k) + tamanho_firestore(v) for k, v in value.items()
+        )
+    if isinstance(value, list | tuple):
+        return sum(tamanho_firestore(v) for v in value)
+    raise TypeError(f"Unsupported value: {type(value)}")
+
+
+def iguais(a: list[Any], b: list[Any]) -> bool:
+    return len(a) == len(b) and all(
+        x == y or (x != x and y != y) for x, y in zip(a, b, strict=True)
+    )
+
+
+def main() -> None:
+    print(
+        f"{'pages':>5} {'dates':>5} {'rows':>6} {'plain (KiB)':>12} "
+        f"{'compact (KiB)':>14} {'ratio':>6} {'encode (ms)':>12} {'decode (ms)':>12}"
+    )
+    for pages, dates, rows in SAMPLES:
+        content = make_evolutive_report(pages, dates, rows, references=REFERENCES)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            document = get_document_from_pdf_exam(content)
+        start = time.perf_counter()
+        compact = codifica_documento(document)
+        encode_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        decoded = decodifica_documento(compact)
+        decode_ms = (time.perf_counter() - start) * 1000
+        assert list(decoded) == list(document)
+        assert all(iguais(decoded[c], document[c]) for c in document)
+
+        plain_size = tamanho_firestore(document) + DOCUMENT_OVERHEAD
+        compact_size = tamanho_firestore(compact) + DOCUMENT_OVERHEAD
+        flag = "  over 1 MiB (plain)" if plain_size > FIRESTORE_MAX_DOCUMENT else ""
+        print(
+            f"{pages:>5} {dates:>5} {len(document['ANALITOS']):>6} "
+            f"{plain_size / 1024:>12.1f} {compact_size / 1024:>14.1f} "
+            f"{plain_size / compact_size:>5.1f}x {encode_ms:>12.1f} "
+            f"{decode_ms:>12.1f}{flag}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Compares the two extraction engines of get_document_from_pdf_exam,
+find_tables ("tables") and the word coordinates ("words"), over synthetic
+reports of several sizes and reference formats, some with a signature
+footer below the tables, and checks that both produce the same document.
+The extraction column is the time of the engine itself: find_tables plus
+eliminate_junk_and_rename_cols, or extract_words plus
+trata_colunas_iniciais.
+
+Usage (from the functions directory):
+    python -m benchmarks.engines [--repeat N]
+"""
+
+import argparse
+import contextlib
+import os
+import time
+
+from src import timing
+from src.documents import ENGINES, ExamDocument
+from src.utils import get_document_from_pdf_exam
+
+from benchmarks.encoding import REFERENCES, iguais
+from benchmarks.synthetic import make_evolutive_report
+
+FOOTER = "Liberado eletronicamente por Dr. Fulano de Tal - CRM 12345 - 10/10/2020"
+# páginas, tabelas por página, datas, linhas, páginas sem tabela, rodapé
+SAMPLES = [
+    (1, 1, 3, 10, 0, None),
+    (1, 1, 3, 5, 0, FOOTER),
+    (2, 2, 6, 20, 1, FOOTER),
+    (4, 1, 12, 30, 2, None),
+    (8, 3, 12, 30, 2, FOOTER),
+]
+EXTRACTION_STAGES = {
+    "tables": ["find_tables", "eliminate_junk_and_rename_cols"],
+    "words": ["extract_words", "trata_colunas_iniciais"],
+}
+
+
+def run(
+    content: bytes, engine: str, repeat: int
+) -> tuple[float, float, int, ExamDocument]:
+    """Returns the best total and extraction times, fallback pages and the document."""
+    totals, extraction, fallback, document = [], [], 0, {}
+    for _ in range(repeat):
+        with (
+            open(os.devnull, "w") as devnull,
+            contextlib.redirect_stdout(devnull),
+            timing.tracing("engines", emit=False) as trace,
+        ):
+            start = time.perf_counter()
+            document = get_document_from_pdf_exam(content, engine=engine)
+            totals.append(time.perf_counter() - start)
+        extraction.append(
+            sum(trace.stages_ms.get(s, 0) for s in EXTRACTION_STAGES[engine]) / 1000
+        )
+        fallback = trace.counts.get("pages_fallback", 0)
+    return min(totals), min(extraction), fallback, document
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        f"{'case':<18} {'engine':<7} {'time (s)':>9} {'extraction (s)':>15} "
+        f"{'fallback':>9} {'speedup':>8}"
+    )
+    for pages, tables, dates, rows, text_pages, footer in SAMPLES:
+        content = make_evolutive_report(
+            pages,
+            dates,
+            rows,
+            REFERENCES,
+            tables=tables,
+            text_pages=text_pages,
+            footer=footer,
+        )
+        case = f"{pages}p{tables}t{dates}d{rows}r{text_pages}x{'f' if footer else ''}"
+        baseline, expected = 0.0, None
+        for engine in ENGINES:
+            elapsed, extraction, fallback, document = run(content, engine, args.repeat)
+            if expected is None:
+                baseline, expected = elapsed, document
+            assert list(document) == list(expected), engine
+            assert all(iguais(document[c], expected[c]) for c in expected), engine
+            print(
+                f"{case:<18} {engine:<7} {elapsed:>9.3f} {extraction:>15.3f} "
+                f"{fallback:>9} {baseline / elapsed:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
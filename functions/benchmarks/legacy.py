@@ -0,0 +1,117 @@
+"""
+Reference implementation of mapeia_valores_referencia as it was before the
+rule engine in src.referencias, kept only to check parity and measure speed.
+"""
+
+
+def mapeia_valores_referencia_legado(cell: str | None) -> tuple[str | None, ...]:
+    """
+    This function is used to map and parse reference values from a given cell
+    in a PDF table. It extracts the lower and upper limits,
+    as well as the unit of measurement, from the cell content.
+
+    Parameters:
+    cell (str | None): The cell content from which to extract the reference values.
+
+    Returns:
+    tuple[str | None,...]: A tuple containing the lower limit,
+    upper limit, and unit of measurement.
+    If the cell content does not contain reference values,
+    the tuple will contain None for all values.
+    """
+    try:
+        superior, inferior, unidade = None, None, "Não encontrado pela IA..."
+        if not isinstance(cell, str):
+            return None, None, None
+        if cell == "----":
+            return None, None, None
+        cell = cell.replace("De", "")
+        if "inferior a " in cell:
+            inferior_e_unidade = cell.split("inferior a ")[1]
+            inferior, unidade = inferior_e_unidade.split(" ")
+        elif " a " in cell:
+            inferior, superior_e_unidade = cell.split(" a ")
+            inferior = inferior.strip()
+            if ":" in inferior.lower():
+                inferior = inferior.split(":")[1]
+            if " " in superior_e_unidade:
+                superior, unidade = superior_e_unidade.split(" ")
+                superior = superior.strip()
+            elif "/" in superior_e_unidade:
+                superior, unidade = superior_e_unidade.split("/")
+                unidade = "/" + unidade
+                superior = superior.strip()
+        elif "Ver resultado tradicional" in cell:
+            inferior, superior, unidade = None, None, "Ver resultado tradicional"
+        elif "jejum" in cell:
+            tupla_jejum = cell.split("\n")
+            if len(tupla_jejum) == 2:
+                com_jejum, sem_jejum = tupla_jejum
+                if "menor que " in sem_jejum.lower() or "< " in sem_jejum:
+                    if "< " in sem_jejum:
+                        inferior_e_unidade = sem_jejum.split("< ")[1]
+                        inferior, unidade = inferior_e_unidade.split(" ")
+                    else:
+                        inferior_e_unidade = sem_jejum.split("enor que ")[1]
+                        inferior, unidade = inferior_e_unidade.split(" ")
+                elif "menor que " in com_jejum.lower() or "< " in com_jejum:
+                    if "< " in sem_jejum:
+                        inferior_e_unidade = sem_jejum.split("< ")[1]
+                        inferior, unidade = inferior_e_unidade.split(" ")
+                    else:
+                        superior_e_unidade = com_jejum.split("enor que ")[1]
+                        superior, unidade = superior_e_unidade.split(" ")
+                elif "maior que " in sem_jejum.lower() or "> " in sem_jejum:
+                    if "> " in sem_jejum:
+                        inferior_e_unidade = sem_jejum.split("> ")[1]
+                        inferior, unidade = inferior_e_unidade.split(" ")
+                    else:
+                        inferior_e_unidade = sem_jejum.split("aior que ")[1]
+                        inferior, unidade = inferior_e_unidade.split(" ")
+                elif "maior que " in com_jejum.lower() or "> " in com_jejum:
+                    if "> " in sem_jejum:
+                        inferior_e_unidade = sem_jejum.split("> ")[1]
+                        inferior, unidade = inferior_e_unidade.split(" ")
+                    else:
+                        superior_e_unidade = com_jejum.split("aior que ")[1]
+                        superior, unidade = superior_e_unidade.split(" ")
+            else:
+                inferior, unidade, superior, _ = tupla_jejum
+                if (
+                    "menor que " in inferior.lower()
+                    and "menor que " in superior.lower()
+                ):
+                    inferior = inferior.split("enor que ")[1].strip()
+                    superior = superior.split("enor que ")[1].strip()
+                if (
+                    "maior que " in inferior.lower()
+                    and "maior que " in superior.lower()
+                ):
+                    inferior = inferior.split("enor que ")[1].strip()
+                    superior = superior.split("enor que ")[1].strip()
+                if "< " in inferior.lower() and "< " in superior.lower():
+                    inferior = inferior.split("< ")[1].strip()
+                    superior = superior.split("< ")[1].strip()
+                if "> " in inferior.lower() and "> " in superior.lower():
+                    inferior = inferior.split("> ")[1].strip()
+                    superior = superior.split("> ")[1].strip()
+        elif "menor que " in cell.lower():
+            inferior_e_unidade = cell.split("enor que ")[1]
+            inferior, unidade = inferior_e_unidade.split(" ")
+        elif "maior que " in cell.lower():
+            superior_e_unidade = cell.split("aior que ")[1]
+            superior, unidade = superior_e_unidade.split(" ")
+        elif "< " in cell:
+            inferior_e_unidade = cell.split("< ")[1]
+            inferior, unidade = inferior_e_unidade.split(" ")
+        elif "> " in cell:
+            superior_e_unidade = cell.split("> ")[1]
+            superior, unidade = superior_e_unidade.split(" ")
+        elif "até" in cell.lower():
+            superior_e_unidade = cell.split("té ")[1]
+            superior, unidade = superior_e_unidade.split(" ")
+        else:
+            inferior, superior, unidade = None, None, unidade
+    except ValueError:
+        inferior, superior, unidade = None, None, None
+    return inferior, superior, unidade
@@ -0,0 +1,176 @@
+"""
+Load generator for the exam API: sends synthetic evolutive reports of each
+payload size at each concurrency level and reports, per level, the status
+counts, p50/p95/p99 latency of the successful requests and the requests
+per second. Every request carries a distinct report, so none of them is
+answered by the exam cache, unless --cached is given.
+
+Without --url it starts benchmarks.server in this process (fake auth,
+in-memory Firestore and Storage) on a free port; with --url it loads an
+already running server, e.g. `python -m benchmarks.server` or the
+Functions emulator (then --token must be a valid ID token).
+
+Usage (from the functions directory):
+    python -m benchmarks.load [--pages 1 4 16] [--concurrency 1 4 8]
+        [--requests 20] [--endpoint send_exam] [--output load.json]
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from benchmarks.synthetic import make_evolutive_report
+
+DATES = 3
+ROWS = 10
+
+
+@dataclass
+class Level:
+    pages: int
+    kib: float
+    concurrency: int
+    requests: int
+    statuses: dict[str, int]
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    rps: float
+
+
+def post(url: str, token: str, content: bytes) -> tuple[int, float]:
+    request = urllib.request.Request(
+        url,
+        data=content,
+        method="POST",
+        headers={
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/pdf",
+        },
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=120) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except OSError:
+        status = 0  # conexão recusada ou timeout
+    return status, time.perf_counter() - start
+
+
+def percentiles(latencies: list[float]) -> tuple[float, float, float]:
+    if not latencies:
+        return 0.0, 0.0, 0.0
+    if len(latencies) == 1:
+        return (latencies[0] * 1000,) * 3
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+    return cuts[49] * 1000, cuts[94] * 1000, cuts[98] * 1000
+
+
+def run_level(
+    url: str, token: str, contents: list[bytes], concurrency: int
+) -> tuple[Counter[int], list[float], float]:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as threads:
+        results = list(threads.map(lambda c: post(url, token, c), contents))
+    elapsed = time.perf_counter() - start
+    statuses = Counter(status for status, _ in results)
+    latencies = [seconds for status, seconds in results if status == 200]
+    return statuses, latencies, elapsed
+
+
+def run() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--url", help="base URL of a running server")
+    parser.add_argument("--endpoint", default="send_exam")
+    parser.add_argument("--token", default="loadtest")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--requests", type=int, default=20, help="per level")
+    parser.add_argument("--cached", action="store_true", help="repeat one report")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--queue", type=int, default=4)
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    base_url = args.url
+    if base_url is None:
+        from benchmarks.server import serve
+
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        server = serve(port=0, workers=args.workers, queue=args.queue)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.port}"
+    url = f"{base_url.rstrip('/')}/{args.endpoint}"
+
+    print(
+        f"{'pages':>5} {'KiB':>7} {'conc':>4} {'ok':>4} {'429':>4} {'err':>4} "
+        f"{'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'req/s':>7}"
+    )
+    levels = []
+    variant = 1000  # referência diferente em cada laudo: nenhum cai no cache
+    for pages in args.pages:
+        # aquecimento: sobe os workers do pool e carrega o parser
+        warmup = make_evolutive_report(pages, DATES, ROWS, references=["Aquecimento"])
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            post(url, args.token, warmup)
+        for concurrency in args.concurrency:
+            if args.cached:
+                contents = [make_evolutive_report(pages, DATES, ROWS)] * args.requests
+            else:
+                contents = [
+                    make_evolutive_report(pages, DATES, ROWS, [f"Até {n} U/L"])
+                    for n in range(variant, variant + args.requests)
+                ]
+                variant += args.requests
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                statuses, latencies, elapsed = run_level(
+                    url, args.token, contents, concurrency
+                )
+            p50, p95, p99 = percentiles(latencies)
+            level = Level(
+                pages=pages,
+                kib=round(sum(map(len, contents)) / len(contents) / 1024, 1),
+                concurrency=concurrency,
+                requests=args.requests,
+                statuses={str(k): v for k, v in sorted(statuses.items())},
+                p50_ms=round(p50, 1),
+                p95_ms=round(p95, 1),
+                p99_ms=round(p99, 1),
+                rps=round(args.requests / elapsed, 2),
+            )
+            levels.append(level)
+            errors = args.requests - statuses[200] - statuses[429]
+            print(
+                f"{pages:>5} {level.kib:>7.1f} {concurrency:>4} {statuses[200]:>4} "
+                f"{statuses[429]:>4} {errors:>4} {p50:>9.1f} {p95:>9.1f} "
+                f"{p99:>9.1f} {level.rps:>7.2f}"
+            )
+
+    if args.output:
+        result: dict[str, Any] = {
+            "url": url,
+            "cached": args.cached,
+            "levels": [asdict(level) for level in levels],
+        }
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    run()
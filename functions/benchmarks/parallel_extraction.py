@@ -0,0 +1,66 @@
+"""
+Compares the serial and the page-parallel paths of get_initial_data, the
+latter both cold (the first document, which starts the page pool) and warm
+(the next ones, which reuse it).
+
+With one CPU (where the parallel time minus the serial one is the cost of
+the pool), 6 dates and 30 rows, one page took about 0.2 s. A cold pool
+added 1.9 s to a 2-page document and 2.0 s to a 4-page one. The warm pool
+added less than 0.2 s.
+
+Usage (from the functions directory):
+    python -m benchmarks.parallel_extraction [--workers N] [--repeat N]
+"""
+
+import argparse
+import contextlib
+import os
+import time
+
+from pandas.testing import assert_frame_equal
+from src import utils
+from src.utils import get_initial_data
+
+from benchmarks.synthetic import make_evolutive_report
+
+PAGE_COUNTS = [1, 2, 4, 8, 16, 32]
+
+
+def best_of(repeat: int, content: bytes, max_workers: int) -> tuple[float, object]:
+    best, df = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            df = get_initial_data(content, max_workers=max_workers)
+        best = min(best, time.perf_counter() - start)
+    return best, df
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--dates", type=int, default=6)
+    parser.add_argument("--rows", type=int, default=30)
+    args = parser.parse_args()
+
+    print(
+        f"{'pages':>5} {'serial (s)':>11} {'cold (s)':>9} {'warm (s)':>9} "
+        f"{'speedup':>8}"
+    )
+    for pages in PAGE_COUNTS:
+        content = make_evolutive_report(pages, args.dates, args.rows)
+        serial, expected = best_of(args.repeat, content, 1)
+        utils._descarta_pool_de_paginas(min(args.workers, os.cpu_count() or 1))
+        cold, result = best_of(1, content, args.workers)
+        assert_frame_equal(result, expected)
+        warm, result = best_of(args.repeat, content, args.workers)
+        assert_frame_equal(result, expected)
+        print(
+            f"{pages:>5} {serial:>11.3f} {cold:>9.3f} {warm:>9.3f} "
+            f"{serial / warm:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Compares get_initial_data with the page pre-screen off, on, and on with
+find_tables clipped to the table header, on reports padded with pages
+without tables (cover and free-text addenda) and followed by pages whose
+table goes on without the ANALITOS/RESULTADOS header. Each report is run
+twice, with undated pages without tables and with dated ones (a birth date
+on a framed cover, a release date on the addenda), which must be skipped
+too. Checks that the three modes extract the same data.
+
+Usage (from the functions directory):
+    python -m benchmarks.prescreen [--text-pages N] [--continuation-pages N]
+"""
+
+import argparse
+import contextlib
+import os
+import time
+
+from pandas import DataFrame
+from pandas.testing import assert_frame_equal
+from src import timing, utils
+
+from benchmarks.synthetic import make_evolutive_report
+
+MODES = {
+    "off": (False, False),
+    "prescreen": (True, False),
+    "prescreen+clip": (True, True),
+}
+
+
+def run(content: bytes, repeat: int) -> tuple[float, float, int, DataFrame]:
+    """Returns the best total and find_tables times, the skipped pages and the data."""
+    totals, find_tables, skipped, df = [], [], 0, DataFrame()
+    for _ in range(repeat):
+        with (
+            open(os.devnull, "w") as devnull,
+            contextlib.redirect_stdout(devnull),
+            timing.tracing("prescreen", emit=False) as trace,
+        ):
+            start = time.perf_counter()
+            df = utils.get_initial_data(content)
+            totals.append(time.perf_counter() - start)
+        find_tables.append(trace.stages_ms["find_tables"] / 1000)
+        skipped = trace.counts.get("pages_skipped", 0)
+    return min(totals), min(find_tables), skipped, df
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=4)
+    parser.add_argument("--text-pages", type=int, default=4)
+    parser.add_argument("--continuation-pages", type=int, default=1)
+    parser.add_argument("--dates", type=int, default=6)
+    parser.add_argument("--rows", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        f"{args.pages} table pages, {args.continuation_pages} continuation "
+        f"pages, {args.text_pages} pages without tables"
+    )
+    for dated_text in (False, True):
+        content = make_evolutive_report(
+            args.pages,
+            args.dates,
+            args.rows,
+            text_pages=args.text_pages,
+            continuation_pages=args.continuation_pages,
+            dated_text=dated_text,
+        )
+        print(f"\npages without tables {'with' if dated_text else 'without'} dates")
+        print(f"{'mode':<16} {'time (s)':>9} {'find_tables (s)':>16} {'skipped':>8}")
+        expected = None
+        for mode, (prescreen, clip) in MODES.items():
+            utils.PRESCREEN_PAGES, utils.CLIP_TO_HEADER = prescreen, clip
+            elapsed, find_tables, skipped, df = run(content, args.repeat)
+            if expected is None:
+                expected = df
+            assert_frame_equal(df, expected)
+            assert skipped == (args.text_pages if prescreen else 0), skipped
+            print(f"{mode:<16} {elapsed:>9.3f} {find_tables:>16.3f} {skipped:>8}")
+
+
+if __name__ == "__main__":
+    main()
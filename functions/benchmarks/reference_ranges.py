@@ -0,0 +1,118 @@
+"""
+Compares the reference-range rule engine (src.referencias) with the legacy
+mapeia_valores_referencia on a synthetic corpus: checks that both give the
+same limits and units, then times the legacy per-row Series.map against the
+memoized engine applied on unique values.
+
+Usage (from the functions directory):
+    python -m benchmarks.reference_ranges [--rows N] [--distinct N]
+"""
+
+import argparse
+import random
+import time
+
+from pandas import DataFrame, Series
+from src.referencias import mapeia_valores_referencia
+from src.utils import parseia_referencia
+
+from benchmarks.legacy import mapeia_valores_referencia_legado
+
+UNIDADES = ["mg/dL", "g/dL", "U/L", "mUI/L", "ng/mL", "%", "/mm3", "mL/min"]
+FORMATOS = [
+    "De {a} a {b} {u}",
+    "{a} a {b} {u}",
+    "Adultos: {a} a {b} {u}",
+    "{a} a {b}/{u}",
+    "Inferior a {b} {u}",
+    "inferior a {b} {u}",
+    "Menor que {b} {u}",
+    "menor que {b} {u}",
+    "Maior que {a} {u}",
+    "< {b} {u}",
+    "> {a} {u}",
+    "Até {b} {u}",
+    "até {b} {u}",
+    "Com jejum: menor que {b} {u}\nSem jejum: menor que {a} {u}",
+    "Com jejum: < {b} {u}\nSem jejum: < {a} {u}",
+    "Com jejum: maior que {b} {u}\nSem jejum: > {a} {u}",
+    "Com jejum\nde 12 horas",
+    "menor que {a}\n{u}\nmenor que {b}\njejum",
+    "< {a}\n{u}\n< {b}\njejum",
+    "Ver resultado tradicional",
+    "----",
+    "Negativo",
+    "De {a} a {b} {u} (adultos)",
+    "{a} a {b} a {b} {u}",
+    "Com jejum: > {b} {u}\nSem jejum: {a} {u}",
+    "ATÉ {b} {u}",
+]
+
+
+def make_references(distinct: int, seed: int = 0) -> list[str | None]:
+    rng = random.Random(seed)
+    references: list[str | None] = [None]
+    while len(references) < distinct:
+        low = rng.choice([rng.randint(0, 200), round(rng.uniform(0, 10), 2)])
+        high = low + rng.choice([rng.randint(1, 300), round(rng.uniform(0, 5), 1)])
+        references.append(
+            rng.choice(FORMATOS).format(
+                a=str(low).replace(".", ","),
+                b=str(high).replace(".", ","),
+                u=rng.choice(UNIDADES),
+            )
+        )
+    return references
+
+
+def check_parity(references: list[str | None]) -> tuple[int, set[str | None]]:
+    """
+    Returns how many references give the same result in both parsers and the
+    references that crash the legacy parser (IndexError), for which the engine
+    returns a result instead.
+    """
+    matches, crashes = 0, set()
+    for reference in references:
+        try:
+            expected = mapeia_valores_referencia_legado(reference)
+        except IndexError:
+            crashes.add(reference)
+            continue
+        result = mapeia_valores_referencia(reference)
+        assert result == expected, f"{reference!r}: {result} != {expected}"
+        matches += 1
+    return matches, crashes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--distinct", type=int, default=500)
+    args = parser.parse_args()
+
+    references = make_references(args.distinct)
+    matches, crashes = check_parity(references)
+    print(f"parity: {matches} references match, {len(crashes)} crash the legacy parser")
+
+    rng = random.Random(1)
+    safe = [r for r in references if r not in crashes]
+    column = Series([rng.choice(safe) for _ in range(args.rows)], dtype=object)
+
+    start = time.perf_counter()
+    column.map(mapeia_valores_referencia_legado)
+    legacy = time.perf_counter() - start
+
+    mapeia_valores_referencia.cache_clear()
+    start = time.perf_counter()
+    parseia_referencia(
+        DataFrame({"VALORES DE REFERÊNCIA": column}), ["VALORES DE REFERÊNCIA"]
+    )
+    engine = time.perf_counter() - start
+
+    print(f"legacy Series.map:           {legacy:.3f} s")
+    print(f"engine on unique values:     {engine:.3f} s ({legacy / engine:.1f}x)")
+    print(f"cache: {mapeia_valores_referencia.cache_info()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Latency and memory regression check for the Ficha/Data reshaping done by
+trata_colunas_iniciais. Every exam date becomes a block of rows, so doubling
+the number of dates must roughly double time and peak memory; a quadratic
+regression (e.g. concatenating the growing frame inside the loop) makes the
+ratio approach 4x and fails the check.
+
+Usage (from the functions directory):
+    python -m benchmarks.reshape_regression [--rows N] [--dates N]
+Exits with status 1 when the growth exceeds --max-ratio.
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from memory_profiler import memory_usage
+from pandas import DataFrame
+from src.utils import trata_colunas_iniciais
+
+
+def make_raw_table(dates: int, rows: int) -> DataFrame:
+    """
+    This function builds a frame shaped like the output of tab.to_pandas()
+    for an evolutive report: the second row holds "Ficha\\nData" for each
+    exam date and the following rows hold one analyte each.
+    """
+    columns = (
+        ["ANALITOS", "RESULTADOS"]
+        + [f"Col{i}" for i in range(2, dates + 1)]
+        + ["VALORES DE REFERÊNCIA"]
+    )
+    header = (
+        [None]
+        + [
+            f"{100000 + d}\n{d % 28 + 1:02d}/{d % 12 + 1:02d}/2020"
+            for d in range(dates)
+        ]
+        + [None]
+    )
+    body = [
+        [f"Analito {r}"] + [f"{r},{d}" for d in range(dates)] + ["De 70 a 99 mg/dL"]
+        for r in range(rows)
+    ]
+    return DataFrame([header, *body], columns=columns)
+
+
+def measure_once(dates: int, rows: int) -> tuple[float, float]:
+    raw = make_raw_table(dates, rows)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        baseline = memory_usage(-1, interval=0.01, timeout=0.05, max_usage=True)
+        peak = memory_usage(
+            (trata_colunas_iniciais, (raw.copy(), 1)), interval=0.005, max_usage=True
+        )
+        start = time.perf_counter()
+        trata_colunas_iniciais(raw, 1)
+        elapsed = time.perf_counter() - start
+    return elapsed, max(peak - baseline, 0.0)
+
+
+def measure(dates: int, rows: int, repeat: int) -> tuple[float, float]:
+    """
+    Each repetition runs in a fresh process, so that memory freed by an
+    earlier run and kept by the allocator does not hide the peak of the next.
+    """
+    results = []
+    for _ in range(repeat):
+        with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as pool:
+            results.append(pool.submit(measure_once, dates, rows).result())
+    return min(r[0] for r in results), min(r[1] for r in results)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--dates", type=int, default=24)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-ratio", type=float, default=3.0)
+    args = parser.parse_args()
+
+    small_time, small_memory = measure(args.dates, args.rows, args.repeat)
+    large_time, large_memory = measure(args.dates * 2, args.rows, args.repeat)
+    time_ratio = large_time / small_time
+    # incrementos de memória muito pequenos são ruído do RSS
+    memory_ratio = large_memory / small_memory if small_memory > 1 else 1.0
+
+    print(f"{'dates':>6} {'time (s)':>9} {'peak increment (MiB)':>21}")
+    print(f"{args.dates:>6} {small_time:>9.3f} {small_memory:>21.1f}")
+    print(f"{args.dates * 2:>6} {large_time:>9.3f} {large_memory:>21.1f}")
+    print(f"time ratio {time_ratio:.2f}x, memory ratio {memory_ratio:.2f}x")
+    if time_ratio > args.max_ratio or memory_ratio > args.max_ratio:
+        print(f"FAIL: growth above {args.max_ratio}x when doubling dates")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
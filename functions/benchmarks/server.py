@@ -0,0 +1,123 @@
+"""
+Serves the HTTPS functions of main.py locally, without deploying and
+without Firebase credentials: tokens are checked by the fake verifier of
+src.local (the bearer token is the uid, e.g. "Authorization: Bearer
+alice"), Firestore and Storage are the in-memory stand-ins, and uploads
+to send_exam_async are processed right away, like the storage trigger.
+
+Usage (from the functions directory):
+    python -m benchmarks.server [--port 8080] [--workers N] [--queue N]
+    curl -H "Authorization: Bearer alice" -H "Content-Type: application/pdf" \
+        --data-binary @laudo.pdf http://127.0.0.1:8080/send_exam
+"""
+
+import argparse
+import contextlib
+import os
+from typing import Any, cast
+
+# o decorator de storage_fn lê o bucket padrão da configuração do projeto
+os.environ.setdefault(
+    "FIREBASE_CONFIG", '{"storageBucket": "local-bucket", "projectId": "local"}'
+)
+
+import main  # noqa: E402
+from flask import Flask, jsonify, request  # noqa: E402
+from src.cache import ExamCache  # noqa: E402
+from src.local import (  # noqa: E402
+    InMemoryFirestore,
+    cria_pipeline_assincrono_em_memoria,
+    cria_verificador_local,
+)
+from src.pool import ParserPool  # noqa: E402
+from werkzeug.serving import BaseWSGIServer, make_server  # noqa: E402
+
+ENDPOINTS = [
+    "send_exam",
+    "send_exams",
+    "send_exam_async",
+    "query_exams",
+    "export_exams",
+]
+
+
+def install_stand_ins(
+    workers: int | None = None, queue: int | None = None
+) -> InMemoryFirestore:
+    """
+    Points the module globals of main at the local stand-ins: fake token
+    verifier, in-memory Firestore and Storage, an exam cache without the
+    Firestore tier and a parser pool of the given size. Returns the
+    in-memory Firestore, to inspect what the handlers wrote.
+    """
+    main.exam_cache = ExamCache()
+    client, bucket = cria_pipeline_assincrono_em_memoria(cache=main.exam_cache)
+    main.token_verifier = cria_verificador_local()
+    main.firestore_client = cast(Any, lambda: client)
+    main.storage_bucket = cast(Any, lambda name=None: bucket)
+    main.parser_pool = ParserPool(max_workers=workers, max_pending=queue)
+    return client
+
+
+def create_app(client: InMemoryFirestore) -> Flask:
+    """Routes /<endpoint> to the handlers of main.py."""
+    app = Flask(__name__)
+
+    def handle(endpoint: str) -> Any:
+        return getattr(main, endpoint)(request)
+
+    for endpoint in ENDPOINTS:
+        app.add_url_rule(
+            f"/{endpoint}",
+            endpoint,
+            lambda endpoint=endpoint: handle(endpoint),
+            methods=["GET", "POST", "OPTIONS"],
+        )
+
+    @app.get("/_stats")
+    def stats() -> Any:
+        return jsonify(
+            documents=len(client.documents),
+            auth_cache=main.token_verifier.stats(),
+            parser_pool={
+                "workers": main.parser_pool.max_workers,
+                "queue": main.parser_pool.max_pending,
+                "in_flight": main.parser_pool.in_flight,
+            },
+        )
+
+    return app
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8080,
+    workers: int | None = None,
+    queue: int | None = None,
+) -> BaseWSGIServer:
+    """
+    Builds the threaded WSGI server; port 0 picks a free port (see
+    server.port). Call serve_forever() on the result to start it.
+    """
+    client = install_stand_ins(workers, queue)
+    return make_server(host, port, create_app(client), threaded=True)
+
+
+def run() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--queue", type=int, default=4)
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.workers, args.queue)
+    print(f"Serving {', '.join(ENDPOINTS)} on http://{args.host}:{server.port}")
+    with contextlib.suppress(KeyboardInterrupt):
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,113 @@
+"""
+Cold-start benchmark: imports main in a fresh interpreter with
+python -X importtime, as an instance does on a cold start, and reports the
+median import time and the heaviest modules. Fails when the parsing stack
+or the Firestore/Storage clients (HEAVY_MODULES) are loaded at import time,
+since those must only load on first use.
+
+Usage (from the functions directory):
+    python -m benchmarks.startup [--repeat N] [--output startup.json]
+    python -m benchmarks.startup --compare startup.json [--max-ratio 1.25]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any
+
+HEAVY_MODULES = [
+    "pandas",
+    "pymupdf",
+    "pyarrow",
+    "google.cloud.firestore",
+    "google.cloud.storage",
+]  # firebase_admin.auth já vem com firebase_functions, não dá para adiar
+# o decorator de storage_fn lê o bucket padrão da configuração do projeto
+FIREBASE_CONFIG = '{"storageBucket": "local-bucket", "projectId": "local"}'
+
+
+def import_times(module: str) -> dict[str, int]:
+    """
+    This function imports module in a fresh interpreter and parses the
+    -X importtime report.
+
+    Returns:
+    dict[str, int]: The cumulative import time, in microseconds, of every
+    module loaded by the import.
+    """
+    env = {**os.environ, "FIREBASE_CONFIG": FIREBASE_CONFIG}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    times: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def measure(module: str, repeat: int) -> dict[str, Any]:
+    runs = [import_times(module) for _ in range(repeat)]
+    loaded = runs[-1]
+    top = sorted(
+        (name for name in loaded if name != module and "." not in name),
+        key=lambda name: loaded[name],
+        reverse=True,
+    )[:10]
+    return {
+        "import_ms": round(statistics.median(r[module] for r in runs) / 1000, 1),
+        "modules_loaded": len(loaded),
+        "top_level_ms": {name: round(loaded[name] / 1000, 1) for name in top},
+        "heavy_loaded": [m for m in HEAVY_MODULES if m in loaded],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--max-ratio", type=float, default=1.25)
+    args = parser.parse_args()
+
+    result = measure(args.module, args.repeat)
+    print(f"import {args.module}: {result['import_ms']:.1f} ms (median)")
+    print(f"{result['modules_loaded']} modules loaded; heaviest top-level packages:")
+    for name, ms in result["top_level_ms"].items():
+        print(f"  {name:<24} {ms:>8.1f} ms")
+
+    status = 0
+    if result["heavy_loaded"]:
+        print(f"FAIL: loaded at import time: {', '.join(result['heavy_loaded'])}")
+        status = 1
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        ratio = result["import_ms"] / baseline["import_ms"]
+        print(f"baseline {baseline['import_ms']:.1f} ms, ratio {ratio:.2f}x")
+        if ratio > args.max_ratio:
+            print(f"FAIL: import time above {args.max_ratio}x the baseline")
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
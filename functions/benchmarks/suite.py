@@ -0,0 +1,220 @@
+"""
+Offline benchmark of the PDF pipeline over a corpus of synthetic evolutive
+reports. Each case varies the page count, tables per page, exam dates,
+reference-range formats and pages without tables; get_document_from_pdf_exam
+runs under a trace so that every stage of src.utils (pdf_open, prescreen,
+find_tables, eliminate_junk_and_rename_cols, parse_number_cols,
+parseia_referencia, to_document) gets its time and, on a separate
+tracemalloc run, its peak allocation. No Firebase credentials are needed.
+
+Usage (from the functions directory):
+    python -m benchmarks.suite --output baseline.json
+    python -m benchmarks.suite --compare baseline.json [--max-ratio 1.25]
+With --compare, exits with status 1 when the total time of any case grows
+above --max-ratio of the baseline.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from importlib.metadata import version
+from typing import Any
+
+from src import timing
+from src.utils import get_document_from_pdf_exam
+
+from benchmarks.synthetic import make_evolutive_report
+
+REFERENCIAS = {
+    "intervalo": ["De 70 a 99 mg/dL"],
+    "misto": [
+        "De 70 a 99 mg/dL",
+        "Inferior a 200 mg/dL",
+        "Até 40 U/L",
+        "Maior que 60 mL/min",
+        "< 5,0 %",
+        "0,5 a 1,2 mg/dL",
+        "Negativo",
+    ],
+}
+
+
+@dataclass(frozen=True)
+class Case:
+    pages: int
+    tables: int
+    dates: int
+    rows: int
+    referencias: str
+    text_pages: int = 0
+
+    @property
+    def name(self) -> str:
+        sizes = f"p{self.pages}-t{self.tables}-d{self.dates}-r{self.rows}"
+        extra = f"-c{self.text_pages}" if self.text_pages else ""
+        return f"{sizes}-{self.referencias}{extra}"
+
+    def build(self) -> bytes:
+        return make_evolutive_report(
+            pages=self.pages,
+            dates=self.dates,
+            rows=self.rows,
+            references=REFERENCIAS[self.referencias],
+            tables=self.tables,
+            text_pages=self.text_pages,
+        )
+
+
+CASES = [
+    Case(1, 1, 3, 10, "intervalo"),
+    Case(1, 1, 3, 10, "misto"),
+    Case(4, 1, 3, 20, "misto"),
+    Case(4, 2, 3, 10, "misto"),
+    Case(4, 1, 3, 20, "misto", text_pages=4),
+    Case(1, 1, 12, 20, "misto"),
+    Case(8, 1, 6, 30, "misto"),
+    Case(16, 1, 6, 30, "intervalo"),
+]
+QUICK_CASES = CASES[:3]
+
+
+def run_traced(content: bytes, name: str) -> tuple[float, timing.Trace]:
+    with (
+        open(os.devnull, "w") as devnull,
+        contextlib.redirect_stdout(devnull),
+        timing.tracing(name, emit=False) as trace,
+    ):
+        start = time.perf_counter()
+        get_document_from_pdf_exam(content)
+        elapsed = time.perf_counter() - start
+    return elapsed * 1000, trace
+
+
+def measure(case: Case, repeat: int) -> dict[str, Any]:
+    """
+    Times the case repeat times (keeping the median of each stage) and then
+    runs it once more under tracemalloc for the peak allocation of each stage,
+    since tracing allocations slows the run down.
+    """
+    content = case.build()
+    totals, stages, counts = [], [], {}
+    for _ in range(repeat):
+        total_ms, trace = run_traced(content, case.name)
+        totals.append(total_ms)
+        stages.append(trace.stages_ms)
+        counts = trace.counts
+
+    tracemalloc.start()
+    try:
+        _, trace = run_traced(content, case.name)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "pdf_bytes": len(content),
+        "counts": counts,
+        "total_ms": round(statistics.median(totals), 2),
+        "min_total_ms": round(min(totals), 2),
+        "stages_ms": {
+            stage: round(statistics.median(s[stage] for s in stages), 2)
+            for stage in stages[0]
+        },
+        "peak_kib": round(peak / 1024, 1),
+        "stages_peak_kib": {k: round(v, 1) for k, v in trace.peak_kib.items()},
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def environment() -> dict[str, Any]:
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "pymupdf": version("pymupdf"),
+        "pandas": version("pandas"),
+    }
+
+
+def compare(
+    baseline: dict[str, Any], results: dict[str, Any], max_ratio: float
+) -> bool:
+    """Prints the ratio of each case against the baseline; False on regression."""
+    ok = True
+    print(f"{'case':<32} {'baseline (ms)':>14} {'now (ms)':>9} {'ratio':>6}")
+    for name, result in results.items():
+        before = baseline["cases"].get(name)
+        if before is None:
+            print(f"{name:<32} {'-':>14} {result['total_ms']:>9.1f} {'new':>6}")
+            continue
+        ratio = result["total_ms"] / before["total_ms"]
+        flag = "" if ratio <= max_ratio else "  REGRESSION"
+        ok = ok and not flag
+        print(
+            f"{name:<32} {before['total_ms']:>14.1f} "
+            f"{result['total_ms']:>9.1f} {ratio:>5.2f}x{flag}"
+        )
+        for stage, ms in result["stages_ms"].items():
+            old = before["stages_ms"].get(stage)
+            if old:
+                print(f"  {stage:<30} {old:>14.1f} {ms:>9.1f} {ms / old:>5.2f}x")
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="only the small cases")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--max-ratio", type=float, default=1.25)
+    args = parser.parse_args()
+
+    results: dict[str, Any] = {}
+    print(f"{'case':<28} {'total (ms)':>10} {'peak (KiB)':>11}")
+    for case in QUICK_CASES if args.quick else CASES:
+        results[case.name] = measure(case, args.repeat)
+        print(
+            f"{case.name:<28} {results[case.name]['total_ms']:>10.1f} "
+            f"{results[case.name]['peak_kib']:>11.1f}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"environment": environment(), "cases": results}, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if not compare(baseline, results, args.max_ratio):
+            print(f"FAIL: total time above {args.max_ratio}x the baseline")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+from pymupdf import Document, Page, Rect
+from pymupdf import open as open_pdf
+
+ROW_HEIGHT = 18
+HEADER_HEIGHT = 48
+ANALITO_WIDTH = 150
+RESULT_WIDTH = 70
+REFERENCE_WIDTH = 170
+TABLE_GAP = 40
+
+
+def draw_cell(
+    page: Page, left: float, top: float, right: float, bottom: float, text: str
+) -> None:
+    rect = Rect(left, top, right, bottom)
+    page.draw_rect(rect, color=(0, 0, 0), width=0.5)
+    if text:
+        page.insert_textbox(rect + (2, 2, -2, -2), text, fontsize=7)
+
+
+def make_evolutive_report(
+    pages: int = 2,
+    dates: int = 3,
+    rows: int = 10,
+    references: list[str] | None = None,
+    tables: int = 1,
+    text_pages: int = 0,
+    continuation_pages: int = 0,
+    footer: str | None = None,
+    dated_text: bool = False,
+) -> bytes:
+    """
+    This function builds a synthetic evolutive lab report with the same
+    table layout the parser expects: an ANALITOS column, one RESULTADOS
+    column per exam date (with "Ficha\\nData" on the second header row)
+    and a VALORES DE REFERÊNCIA column.
+
+    Parameters:
+    pages (int): The number of pages.
+    dates (int): The number of exam dates (Ficha/Data columns).
+    rows (int): The number of analytes per table.
+    references (list[str] | None): The reference range texts, used in turn
+    for each row. Defaults to a single "De 70 a 99 mg/dL".
+    tables (int): The number of tables per page, stacked vertically.
+    text_pages (int): The number of pages without tables: a cover page before
+    the tables and free-text addenda after them.
+    continuation_pages (int): The number of pages, after the table pages,
+    whose table goes on without the ANALITOS/RESULTADOS header: its header
+    row has only the Ficha/Data cells.
+    footer (str | None): A line of text written below the last table of
+    each table page, like the signature of the lab.
+    dated_text (bool): Whether the pages without tables carry dates, like
+    the birth date on the cover and the release date of the addenda, with
+    the cover framed by a drawn rectangle.
+
+    Returns:
+    bytes: The PDF document as bytes.
+    """
+    references = references or ["De 70 a 99 mg/dL"]
+    widths = [ANALITO_WIDTH] + [RESULT_WIDTH] * dates + [REFERENCE_WIDTH]
+    xs: list[float] = [30]
+    for width in widths:
+        xs.append(xs[-1] + width)
+
+    doc = open_pdf()
+    cover = "LAUDO EVOLUTIVO\nPaciente: Fulano de Tal"
+    addendum = "Observações\n" + "Texto livre do laudo. " * 200
+    if dated_text:
+        cover += "\nNascimento: 12/03/1980\nColetado em 02/01/2024"
+        addendum += "\nLiberado em 05/01/2024"
+    if text_pages:
+        page = draw_text_page(doc, cover)
+        if dated_text:
+            page.draw_rect(page.rect + (40, 40, -40, -40), color=(0, 0, 0))
+    table_height = HEADER_HEIGHT + rows * ROW_HEIGHT
+    for page_number in range(pages):
+        page = doc.new_page(
+            width=xs[-1] + 30, height=tables * (table_height + TABLE_GAP) + 60
+        )
+        for table in range(tables):
+            top = 40 + table * (table_height + TABLE_GAP)
+            draw_table(page, xs, top, dates, rows, references, f"{page_number}-{table}")
+        if footer:
+            bottom = 40 + (tables - 1) * (table_height + TABLE_GAP) + table_height
+            page.insert_text((xs[0], bottom + 20), footer, fontsize=8)
+    for page_number in range(continuation_pages):
+        page = doc.new_page(width=xs[-1] + 30, height=table_height + 80)
+        draw_table(
+            page, xs, 40, dates, rows, references, f"c{page_number}", header=False
+        )
+    for _ in range(text_pages - 1):
+        draw_text_page(doc, addendum)
+    content: bytes = doc.tobytes()
+    return content
+
+
+def draw_text_page(doc: Document, text: str) -> Page:
+    page = doc.new_page()
+    page.insert_textbox(page.rect + (50, 50, -50, -50), text, fontsize=9)
+    return page
+
+
+def draw_table(
+    page: Page,
+    xs: list[float],
+    top: float,
+    dates: int,
+    rows: int,
+    references: list[str],
+    label: str,
+    header: bool = True,
+) -> None:
+    reference = len(xs) - 2
+    header_bottom = top + HEADER_HEIGHT
+    if header:
+        draw_cell(page, xs[0], top, xs[1], header_bottom, "ANALITOS")
+        draw_cell(page, xs[1], top, xs[reference], top + ROW_HEIGHT, "RESULTADOS")
+        draw_cell(
+            page, xs[reference], top, xs[-1], header_bottom, "VALORES DE REFERÊNCIA"
+        )
+    else:
+        # continuação: só a linha de Ficha/Data, com as outras células vazias
+        top -= ROW_HEIGHT
+        draw_cell(page, xs[0], top + ROW_HEIGHT, xs[1], header_bottom, "")
+        draw_cell(page, xs[reference], top + ROW_HEIGHT, xs[-1], header_bottom, "")
+    for date in range(dates):
+        ficha = f"{100000 + date}"
+        data = f"{date % 28 + 1:02d}/{date % 12 + 1:02d}/{2010 + date // 12}"
+        draw_cell(
+            page,
+            xs[1 + date],
+            top + ROW_HEIGHT,
+            xs[2 + date],
+            header_bottom,
+            f"{ficha}\n{data}",
+        )
+    top = header_bottom
+    for row in range(rows):
+        bottom = top + ROW_HEIGHT
+        draw_cell(page, xs[0], top, xs[1], bottom, f"Analito {label}-{row}")
+        for date in range(dates):
+            draw_cell(
+                page,
+                xs[1 + date],
+                top,
+                xs[2 + date],
+                bottom,
+                f"{row * 10 + date},{date}",
+            )
+        draw_cell(
+            page, xs[reference], top, xs[-1], bottom, references[row % len(references)]
+        )
+        top = bottom
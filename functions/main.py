@@ -1,23 +1,134 @@
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 import json
-from collections.abc import Callable
+import os
+from collections.abc import Callable, Iterator
 from functools import wraps
-from typing import TypeVar
+from threading import Lock
+from typing import TYPE_CHECKING, Any, TypeVar
 
-import firebase_admin
-from firebase_admin import auth, credentials, firestore
-from firebase_functions import https_fn, logger
+from firebase_functions import https_fn, logger, storage_fn
 from firebase_functions.options import CorsOptions
-from src.utils import get_df_from_pdf_exam
+from src import timing
+from src.batch import (
+    MAX_BATCH_BYTES,
+    MAX_FILE_BYTES,
+    BatchError,
+    extrai_pdfs,
+    grava_em_lotes,
+    processa_em_paralelo,
+    valida_pdf,
+)
+from src.cache import (
+    ExamCache,
+    FirestoreCacheStore,
+    chave_do_digest,
+    chave_do_exame,
+)
+from src.compact import codifica_documento
+from src.documents import ENGINES, ExamDocument
+from src.export import (
+    CONTENT_TYPES,
+    EXPORT_FORMATS,
+    EXPORT_SOURCES,
+    EXTENSIONS,
+    exporta,
+)
+from src.jobs import cria_job, le_caminho_do_upload, processa_job
+from src.pool import ParserPool, QueueFull
+from src.resumo import (
+    HISTORY_PAGE_SIZE,
+    atualiza_leitura,
+    atualiza_resumo,
+    le_historico,
+    le_painel,
+)
+from src.series import mescla_series
+from src.tokens import TokenUser, TokenVerifier
+from src.upload import PayloadTooLarge, le_corpo
 
-# Initialize Firebase Admin SDK
-cred = credentials.Certificate("./serviceAccountKey.json")
-firebase_admin.initialize_app(cred)
+if TYPE_CHECKING:
+    from firebase_admin import App, auth
+    from google.cloud.firestore import Client
+    from google.cloud.storage import Bucket
 
 RT = TypeVar("RT")  # return type
+INGEST_MODES = ("exam", "incremental")
+ENCODINGS = ("plain", "compact")  # layout do documento salvo em users/{uid}/exams
+QUERY_VIEWS = ("dashboard", "history")
+
+# O Admin SDK, o Firestore e o parser (pandas, pymupdf) só são carregados no
+# primeiro uso, para que o cold start e as requisições rejeitadas na
+# autenticação ou na validação não paguem por eles.
+_app_lock = Lock()
+
+
+def get_app() -> "App":
+    """
+    Initializes the Firebase Admin SDK on first use and returns the default
+    app, which later invocations on the same instance reuse.
+    """
+    import firebase_admin
+
+    with _app_lock:
+        try:
+            return firebase_admin.get_app()
+        except ValueError:
+            from firebase_admin import credentials
+
+            cred = credentials.Certificate("./serviceAccountKey.json")
+            return firebase_admin.initialize_app(cred)
+
+
+def firestore_client() -> "Client":
+    from firebase_admin import firestore
+
+    client: Client = firestore.client(get_app())
+    return client
+
+
+def storage_bucket(name: str | None = None) -> "Bucket":
+    from firebase_admin import storage
+
+    return storage.bucket(name, app=get_app())
+
+
+def verifica_id_token(token: str) -> dict[str, Any]:
+    from firebase_admin import auth
+
+    claims: dict[str, Any] = auth.verify_id_token(token, app=get_app())
+    return claims
+
+
+def busca_usuario(uid: str) -> "auth.UserRecord":
+    from firebase_admin import auth
+
+    return auth.get_user(uid, app=get_app())
+
+
+# Cache de exames já processados, em memória e no Firestore
+exam_cache = ExamCache(store=FirestoreCacheStore(client=firestore_client))
+# Cache de tokens verificados e de usuários, reaproveitado entre requisições
+token_verifier = TokenVerifier(
+    verify_id_token=verifica_id_token, get_user=busca_usuario
+)
+# Workers que processam os PDFs, compartilhados pelas requisições concorrentes
+parser_pool = ParserPool(
+    max_workers=int(os.environ.get("EXAM_POOL_WORKERS", os.cpu_count() or 1)),
+    max_pending=int(os.environ.get("EXAM_POOL_QUEUE", 4)),
+)
 
 
-def token_required(fn: Callable[..., RT]) -> Callable[..., RT | https_fn.HttpsError]:
+def token_required(
+    fn: Callable[..., RT] | None = None, *, fetch_user: bool = True
+) -> Callable[..., Any]:
+    """
+    Verifies the ID token of the request and calls fn with the current user.
+    With fetch_user=False the UserRecord lookup is skipped and fn receives a
+    TokenUser built from the token claims (uid and email).
+    """
+    if fn is None:
+        return lambda f: token_required(f, fetch_user=fetch_user)
+
     @wraps(fn)
     def wrapper(req: https_fn.Request, *args, **kwargs) -> RT | https_fn.HttpsError:  # type: ignore
         logger.info("Verifying for token on header")
@@ -41,10 +152,17 @@ def token_required(fn: Callable[..., RT]) -> Callable[..., RT | https_fn.HttpsEr
 
         try:
             logger.info("Verifying token")
-            decoded_token = auth.verify_id_token(token)
-            logger.info("Token decoded successfully")
-            current_user = auth.get_user(decoded_token["uid"])
-            logger.info(f"calling function for user: {current_user.email}")
+            with timing.stage("auth"):
+                decoded_token = token_verifier.verify(token)
+                logger.info("Token decoded successfully")
+                if fetch_user:
+                    current_user = token_verifier.get_user(decoded_token["uid"])
+                else:
+                    current_user = TokenUser(decoded_token)
+            logger.info(
+                f"calling function for user: {current_user.email}",
+                auth_cache=token_verifier.stats(),
+            )
         except Exception as e:
             return https_fn.Response(  # type: ignore
                 status=401,
@@ -57,21 +175,33 @@ def token_required(fn: Callable[..., RT]) -> Callable[..., RT | https_fn.HttpsEr
     return wrapper
 
 
-@https_fn.on_request(  # type: ignore
-    memory=512,
-    timeout_sec=60,
-    max_instances=1,
-    min_instances=0,
-    cors=CorsOptions(
-        cors_methods=["POST"],
-        cors_origins="*",
-    ),
-    region="southamerica-east1",
-)
-@token_required
-def send_exam(
-    req: https_fn.Request, current_user: auth.UserRecord
-) -> https_fn.Response:
+def valida_opcao(
+    req: https_fn.Request, nome: str, opcoes: tuple[str, ...]
+) -> https_fn.Response | None:
+    """
+    Checks that the query parameter nome, when given, is one of opcoes
+    (the first being the default), returning the error response or None.
+    """
+    if req.args.get(nome, opcoes[0]) in opcoes:
+        return None
+    return https_fn.Response(  # type: ignore
+        status=400,
+        response=json.dumps({"message": f"{nome} must be one of {', '.join(opcoes)}"}),
+        content_type="application/json",
+    )
+
+
+def codifica(document: ExamDocument, encoding: str) -> dict[str, Any]:
+    return codifica_documento(document) if encoding == "compact" else document
+
+
+def valida_pedido_pdf(req: https_fn.Request) -> https_fn.Response | None:
+    """
+    Checks the content type, method and declared length of a single PDF
+    upload, returning the error response or None when the request is valid.
+    The declared length only rejects early: le_corpo enforces the limit on
+    the bytes actually read.
+    """
     logger.info("Verifying content-type")
     if req.content_type != "application/pdf":
         return https_fn.Response(  # type: ignore
@@ -93,28 +223,108 @@ def send_exam(
             content_type="application/json",
         )
     logger.info("Verifying content length")
-    if req.content_length > 5_000_000:
+    if req.content_length > MAX_FILE_BYTES:
         return https_fn.Response(  # type: ignore
             status=413,
             response=json.dumps({"message": "Payload Too Large"}),
             content_type="application/json",
         )
-    logger.info("Reading file")
-    data = req.get_data()
-    logger.info(
-        f"User {current_user.email} sent a file with {req.content_length} bytes"
+    return None
+
+
+@https_fn.on_request(  # type: ignore
+    # várias requisições por instância: o parse roda no parser_pool, que
+    # responde 429 quando a fila enche
+    memory=1024,
+    cpu=2,
+    concurrency=16,
+    timeout_sec=60,
+    max_instances=1,
+    min_instances=0,
+    cors=CorsOptions(
+        cors_methods=["POST"],
+        cors_origins="*",
+    ),
+    region="southamerica-east1",
+)
+@timing.traced
+@token_required
+def send_exam(
+    req: https_fn.Request, current_user: "auth.UserRecord"
+) -> https_fn.Response:
+    erro = valida_pedido_pdf(req)
+    if erro is not None:
+        return erro
+    erro = (
+        valida_opcao(req, "mode", INGEST_MODES)
+        or valida_opcao(req, "encoding", ENCODINGS)
+        or valida_opcao(req, "engine", ENGINES)
     )
+    if erro is not None:
+        return erro
+    # "exam" guarda o laudo inteiro; "incremental" só as observações novas
+    mode = req.args.get("mode", INGEST_MODES[0])
+    encoding = req.args.get("encoding", ENCODINGS[0])
+    engine = req.args.get("engine", ENGINES[0])
+    logger.info("Reading file")
     try:
-        logger.info("Processing file")
-        df = get_df_from_pdf_exam(data)
-        df = df.reset_index(drop=True)
-        document = df.to_dict(orient="list")
-        client = firestore.client()
-        logger.info("Saving file to Firestore")
-        _, doc_ref = client.collection("users/" + current_user.uid + "/exams").add(
-            document,
-            document_id=datetime.now(tz=timezone.utc).isoformat(),
+        with timing.stage("body_read"):
+            data, digest = le_corpo(req.stream, MAX_FILE_BYTES)
+    except PayloadTooLarge:
+        return https_fn.Response(  # type: ignore
+            status=413,
+            response=json.dumps({"message": "Payload Too Large"}),
+            content_type="application/json",
         )
+    timing.count("bytes", len(data))
+    logger.info(f"User {current_user.email} sent a file with {len(data)} bytes")
+    try:
+        key = chave_do_digest(digest, engine)
+        with timing.stage("cache_lookup"):
+            document = exam_cache.get(key)
+        cache_status = "hit" if document is not None else "miss"
+        logger.info(f"Cache {cache_status} for {key}")
+        if document is None:
+            logger.info("Processing file")
+            try:
+                with timing.stage("parse"):
+                    document = parser_pool.processa(data, engine)
+            except QueueFull as e:
+                logger.warn(f"Parser queue full, {parser_pool.in_flight} in flight")
+                return https_fn.Response(  # type: ignore
+                    status=429,
+                    response=json.dumps({"message": "Too Many Requests"}),
+                    headers={"Retry-After": str(e.retry_after)},
+                    content_type="application/json",
+                )
+            exam_cache.set(key, document)
+        client = firestore_client()
+        if mode == "incremental":
+            logger.info("Merging file into the analyte series")
+            with timing.stage("firestore_write"):
+                series = mescla_series(client, current_user.uid, document)
+            with timing.stage("summary_write"):
+                atualiza_resumo(client, current_user.uid, [document])
+            logger.info("File merged successfully", series=series)
+            return https_fn.Response(  # type: ignore
+                status=200,
+                response=json.dumps(
+                    {
+                        "message": "File merged successfully",
+                        "series": series,
+                        "cache": cache_status,
+                    }
+                ),
+                content_type="application/json",
+            )
+        logger.info("Saving file to Firestore")
+        with timing.stage("firestore_write"):
+            _, doc_ref = client.collection("users/" + current_user.uid + "/exams").add(
+                codifica(document, encoding),
+                document_id=datetime.now(tz=timezone.utc).isoformat(),
+            )
+        with timing.stage("summary_write"):
+            atualiza_leitura(client, current_user.uid, [document])
         logger.info("File processed successfully")
         return https_fn.Response(  # type: ignore
             status=200,
@@ -122,6 +332,7 @@ def send_exam(
                 {
                     "message": "File processed successfully",
                     "id": doc_ref.id,
+                    "cache": cache_status,
                 }
             ),
             content_type="application/json",
@@ -135,5 +346,367 @@ def send_exam(
         )
 
 
+@https_fn.on_request(  # type: ignore
+    memory=1024,
+    timeout_sec=300,
+    max_instances=1,
+    min_instances=0,
+    cors=CorsOptions(
+        cors_methods=["POST"],
+        cors_origins="*",
+    ),
+    region="southamerica-east1",
+)
+@timing.traced
+@token_required
+def send_exams(
+    req: https_fn.Request, current_user: "auth.UserRecord"
+) -> https_fn.Response:
+    logger.info("Verifying called method and content length")
+    if req.method != "POST":
+        return https_fn.Response(  # type: ignore
+            status=405,
+            response=json.dumps({"message": "Method Not Allowed"}),
+            content_type="application/json",
+        )
+    erro = valida_opcao(req, "encoding", ENCODINGS) or valida_opcao(
+        req, "engine", ENGINES
+    )
+    if erro is not None:
+        return erro
+    encoding = req.args.get("encoding", ENCODINGS[0])
+    engine = req.args.get("engine", ENGINES[0])
+    # sem Content-Length o multipart e o zip seriam lidos inteiros antes de
+    # qualquer limite; com ele, o werkzeug não lê além do tamanho declarado
+    if req.content_length is None:
+        return https_fn.Response(  # type: ignore
+            status=411,
+            response=json.dumps({"message": "Length Required"}),
+            content_type="application/json",
+        )
+    if req.content_length > MAX_BATCH_BYTES:
+        return https_fn.Response(  # type: ignore
+            status=413,
+            response=json.dumps({"message": "Payload Too Large"}),
+            content_type="application/json",
+        )
+    try:
+        logger.info("Reading files")
+        with timing.stage("body_read"):
+            arquivos = extrai_pdfs(req)
+    except BatchError as e:
+        return https_fn.Response(  # type: ignore
+            status=e.status,
+            response=json.dumps({"message": str(e)}),
+            content_type="application/json",
+        )
+    logger.info(f"User {current_user.email} sent {len(arquivos)} files")
+    timing.count("files", len(arquivos))
+    timing.count("bytes", sum(len(content) for _, content in arquivos))
+
+    statuses: list[dict[str, Any]] = []
+    pendentes: dict[int, str] = {}  # índice do arquivo -> chave do cache
+    documents: dict[int, ExamDocument] = {}
+    for index, (name, content) in enumerate(arquivos):
+        statuses.append({"name": name})
+        erro = valida_pdf(content)
+        if erro is not None:
+            statuses[index].update(status="error", message=erro)
+            continue
+        key = chave_do_exame(content, engine)
+        document = exam_cache.get(key)
+        if document is not None:
+            documents[index] = document
+            statuses[index]["cache"] = "hit"
+        else:
+            pendentes[index] = key
+            statuses[index]["cache"] = "miss"
+
+    logger.info(f"Processing {len(pendentes)} files")
+    with timing.stage("parse"):
+        results = processa_em_paralelo(
+            parser_pool, [arquivos[i][1] for i in pendentes], engine=engine
+        )
+    retry_after = 0
+    for (index, key), result in zip(pendentes.items(), results, strict=True):
+        if isinstance(result, QueueFull):
+            retry_after = max(retry_after, result.retry_after)
+            statuses[index].update(
+                status="retry", message=str(result), retry_after=result.retry_after
+            )
+        elif isinstance(result, Exception):
+            logger.error(f"Error processing {arquivos[index][0]}: {str(result)}")
+            statuses[index].update(status="error", message=str(result))
+        else:
+            documents[index] = result
+            exam_cache.set(key, result)
+
+    if retry_after and not documents:
+        logger.warn(f"Parser queue full, {parser_pool.in_flight} in flight")
+        return https_fn.Response(  # type: ignore
+            status=429,
+            response=json.dumps({"message": "Too Many Requests", "files": statuses}),
+            headers={"Retry-After": str(retry_after)},
+            content_type="application/json",
+        )
+
+    try:
+        now = datetime.now(tz=timezone.utc)
+        to_write = []
+        for offset, index in enumerate(sorted(documents)):
+            document_id = (now + timedelta(microseconds=offset)).isoformat()
+            to_write.append((document_id, codifica(documents[index], encoding)))
+            statuses[index].update(status="ok", id=document_id)
+        logger.info("Saving files to Firestore")
+        with timing.stage("firestore_write"):
+            grava_em_lotes(
+                firestore_client(), "users/" + current_user.uid + "/exams", to_write
+            )
+        with timing.stage("summary_write"):
+            atualiza_leitura(
+                firestore_client(), current_user.uid, list(documents.values())
+            )
+    except Exception as e:
+        logger.error(f"Error saving files: {str(e)}")
+        return https_fn.Response(  # type: ignore
+            status=500,
+            response=json.dumps({"message": "Internal Server Error", "detail": str(e)}),
+            content_type="application/json",
+        )
+    logger.info("Files processed")
+    return https_fn.Response(  # type: ignore
+        status=200,
+        response=json.dumps(
+            {
+                "message": f"{len(documents)} of {len(arquivos)} files processed",
+                "files": statuses,
+            }
+        ),
+        headers={"Retry-After": str(retry_after)} if retry_after else None,
+        content_type="application/json",
+    )
+
+
+@https_fn.on_request(  # type: ignore
+    memory=256,
+    timeout_sec=60,
+    max_instances=10,
+    min_instances=0,
+    cors=CorsOptions(
+        cors_methods=["POST"],
+        cors_origins="*",
+    ),
+    region="southamerica-east1",
+)
+@timing.traced
+@token_required(fetch_user=False)
+def send_exam_async(
+    req: https_fn.Request, current_user: TokenUser
+) -> https_fn.Response:
+    erro = valida_pedido_pdf(req)
+    if erro is not None:
+        return erro
+    logger.info("Reading file")
+    try:
+        with timing.stage("body_read"):
+            data, digest = le_corpo(req.stream, MAX_FILE_BYTES)
+    except PayloadTooLarge:
+        return https_fn.Response(  # type: ignore
+            status=413,
+            response=json.dumps({"message": "Payload Too Large"}),
+            content_type="application/json",
+        )
+    timing.count("bytes", len(data))
+    logger.info(f"User {current_user.email} queued a file with {len(data)} bytes")
+    try:
+        with timing.stage("enqueue"):
+            job_id = cria_job(
+                firestore_client(), storage_bucket(), current_user.uid, data, digest
+            )
+    except Exception as e:
+        logger.error(f"Error queueing file: {str(e)}")
+        return https_fn.Response(  # type: ignore
+            status=500,
+            response=json.dumps({"message": "Internal Server Error", "detail": str(e)}),
+            content_type="application/json",
+        )
+    return https_fn.Response(  # type: ignore
+        status=202,
+        response=json.dumps({"message": "File queued", "job_id": job_id}),
+        content_type="application/json",
+    )
+
+
+@storage_fn.on_object_finalized(  # type: ignore
+    memory=1024,
+    timeout_sec=300,
+    max_instances=1,
+    region="southamerica-east1",
+)
+def process_exam_upload(
+    event: storage_fn.CloudEvent[storage_fn.StorageObjectData],
+) -> None:
+    upload = le_caminho_do_upload(event.data.name)
+    if upload is None:
+        return
+    uid, job_id = upload
+    logger.info(f"Processing upload {event.data.name}")
+    with timing.tracing("process_exam_upload"):
+        with timing.stage("storage_read"):
+            blob = storage_bucket(event.data.bucket).blob(event.data.name)
+            data = blob.download_as_bytes()
+        timing.count("bytes", len(data))
+        processa_job(firestore_client(), uid, job_id, data, cache=exam_cache)
+
+
+@https_fn.on_request(  # type: ignore
+    memory=256,
+    timeout_sec=30,
+    max_instances=10,
+    min_instances=0,
+    cors=CorsOptions(
+        cors_methods=["GET"],
+        cors_origins="*",
+    ),
+    region="southamerica-east1",
+)
+@timing.traced
+@token_required(fetch_user=False)
+def query_exams(req: https_fn.Request, current_user: TokenUser) -> https_fn.Response:
+    """
+    Serves the read side of the exams: view=dashboard (the default) returns
+    the latest value of each analyte from the summary document, optionally
+    filtered by q (part of the name) and out_of_range=1; view=history returns
+    one page of the history of the analyte given in analyte, newest first,
+    optionally filtered by from/to (YYYY-MM-DD, 400 for other formats) and
+    paginated by limit and page_token.
+    """
+    if req.method != "GET":
+        return https_fn.Response(  # type: ignore
+            status=405,
+            response=json.dumps({"message": "Method Not Allowed"}),
+            content_type="application/json",
+        )
+    erro = valida_opcao(req, "view", QUERY_VIEWS)
+    if erro is not None:
+        return erro
+    view = req.args.get("view", QUERY_VIEWS[0])
+    try:
+        with timing.stage("firestore_read"):
+            if view == "dashboard":
+                body = le_painel(
+                    firestore_client(),
+                    current_user.uid,
+                    busca=req.args.get("q"),
+                    apenas_alterados=req.args.get("out_of_range") == "1",
+                )
+            else:
+                nome = req.args.get("analyte")
+                if not nome:
+                    return https_fn.Response(  # type: ignore
+                        status=400,
+                        response=json.dumps({"message": "analyte is required"}),
+                        content_type="application/json",
+                    )
+                history = le_historico(
+                    firestore_client(),
+                    current_user.uid,
+                    nome,
+                    inicio=req.args.get("from"),
+                    fim=req.args.get("to"),
+                    limite=req.args.get("limit", HISTORY_PAGE_SIZE, type=int),
+                    cursor=req.args.get("page_token"),
+                )
+                if history is None:
+                    return https_fn.Response(  # type: ignore
+                        status=404,
+                        response=json.dumps({"message": "Analyte not found"}),
+                        content_type="application/json",
+                    )
+                body = history
+    except ValueError as e:
+        return https_fn.Response(  # type: ignore
+            status=400,
+            response=json.dumps({"message": str(e)}),
+            content_type="application/json",
+        )
+    except Exception as e:
+        logger.error(f"Error reading exams: {str(e)}")
+        return https_fn.Response(  # type: ignore
+            status=500,
+            response=json.dumps({"message": "Internal Server Error", "detail": str(e)}),
+            content_type="application/json",
+        )
+    return https_fn.Response(  # type: ignore
+        status=200,
+        response=json.dumps(body),
+        content_type="application/json",
+    )
+
+
+@https_fn.on_request(
+    memory=512,
+    timeout_sec=540,
+    max_instances=5,
+    min_instances=0,
+    cors=CorsOptions(
+        cors_methods=["GET"],
+        cors_origins="*",
+    ),
+    region="southamerica-east1",
+)
+@token_required(fetch_user=False)
+def export_exams(req: https_fn.Request, current_user: TokenUser) -> https_fn.Response:
+    """
+    Streams all the exams of the user as a columnar file, format=arrow (the
+    default, an Arrow IPC stream) or format=parquet, one row per analyte and
+    exam date (see src.export). source=exams (the default) exports the
+    stored reports; source=analytes exports the per-analyte time series,
+    which also hold the exams sent with send_exam?mode=incremental. The body
+    is sent while the exams are read, so an error after the first chunk can
+    only cut the stream short, and the trace of the export is taken while
+    the body is streamed.
+    """
+    if req.method != "GET":
+        return https_fn.Response(  # type: ignore
+            status=405,
+            response=json.dumps({"message": "Method Not Allowed"}),
+            content_type="application/json",
+        )
+    erro = valida_opcao(req, "format", EXPORT_FORMATS) or valida_opcao(
+        req, "source", EXPORT_SOURCES
+    )
+    if erro is not None:
+        return erro
+    formato = req.args.get("format", EXPORT_FORMATS[0])
+    fonte = req.args.get("source", EXPORT_SOURCES[0])
+    uid = current_user.uid
+
+    def corpo() -> Iterator[bytes]:
+        # o trace cobre a leitura e a serialização, feitas ao transmitir
+        with timing.tracing("export_exams"):
+            try:
+                yield from exporta(firestore_client(), [uid], formato, fonte=fonte)
+            except Exception as e:
+                logger.error(f"Error exporting the exams of {uid}: {str(e)}")
+                raise
+
+    return https_fn.Response(  # type: ignore
+        status=200,
+        response=corpo(),
+        content_type=CONTENT_TYPES[formato],
+        headers={
+            "Content-Disposition": f'attachment; filename="exams.{EXTENSIONS[formato]}"'
+        },
+    )
+
+
 # Ensure the function is exported for Firebase Functions
-exports = {"send_exam": send_exam}
+exports = {
+    "send_exam": send_exam,
+    "send_exams": send_exams,
+    "send_exam_async": send_exam_async,
+    "process_exam_upload": process_exam_upload,
+    "query_exams": query_exams,
+    "export_exams": export_exams,
+}
@@ -0,0 +1,168 @@
+from concurrent.futures import Future
+from io import BytesIO
+from typing import TYPE_CHECKING, Any
+from zipfile import BadZipFile, ZipFile
+
+from firebase_functions import https_fn, logger
+
+from src import timing
+from src.documents import ENGINES, ExamDocument
+from src.pool import RETRY_AFTER_MAX, ParserPool, QueueFull, processa_no_worker
+
+if TYPE_CHECKING:
+    from google.cloud.firestore import Client
+
+MAX_FILE_BYTES = 5_000_000
+MAX_BATCH_BYTES = 50_000_000
+MAX_BATCH_FILES = 50
+FIRESTORE_BATCH_LIMIT = 500  # máximo de operações por batched write
+ZIP_CONTENT_TYPES = ["application/zip", "application/x-zip-compressed"]
+
+
+class BatchError(ValueError):
+    """Error that rejects the whole batch, with the HTTP status to return."""
+
+    def __init__(self, message: str, status: int) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def extrai_pdfs(req: https_fn.Request) -> list[tuple[str, bytes]]:
+    """
+    This function extracts the uploaded files of a batch request, sent either
+    as multipart/form-data (any number of file fields) or as a zip archive.
+    The aggregate size is checked on the uncompressed bytes before reading.
+
+    Parameters:
+    req (https_fn.Request): The batch request.
+
+    Returns:
+    list[tuple[str, bytes]]: The name and the content of each file.
+
+    Raises:
+    BatchError: When the body is not a batch, is empty or exceeds the limits.
+    """
+    arquivos: list[tuple[str, bytes]] = []
+    total = 0
+    if req.mimetype == "multipart/form-data":
+        uploads = req.files.values()
+        if len(req.files) > MAX_BATCH_FILES:
+            raise BatchError(f"At most {MAX_BATCH_FILES} files per batch", 413)
+        for upload in uploads:
+            content = upload.read(MAX_BATCH_BYTES - total + 1)
+            total += len(content)
+            if total > MAX_BATCH_BYTES:
+                raise BatchError("Payload Too Large", 413)
+            arquivos.append((upload.filename or upload.name, content))
+    elif req.mimetype in ZIP_CONTENT_TYPES:
+        try:
+            with ZipFile(BytesIO(req.get_data())) as zip_file:
+                infos = [
+                    info
+                    for info in zip_file.infolist()
+                    if not info.is_dir() and info.filename.lower().endswith(".pdf")
+                ]
+                if len(infos) > MAX_BATCH_FILES:
+                    raise BatchError(f"At most {MAX_BATCH_FILES} files per batch", 413)
+                if sum(info.file_size for info in infos) > MAX_BATCH_BYTES:
+                    raise BatchError("Payload Too Large", 413)
+                for info in infos:
+                    arquivos.append((info.filename, zip_file.read(info)))
+        except BadZipFile as e:
+            raise BatchError(f"Invalid zip file: {str(e)}", 400) from e
+    else:
+        raise BatchError(
+            "Content-Type must be multipart/form-data or application/zip", 400
+        )
+    if not arquivos:
+        raise BatchError("No PDF files found in the request", 400)
+    return arquivos
+
+
+def valida_pdf(content: bytes) -> str | None:
+    """
+    This function checks a single file of a batch.
+
+    Returns:
+    str | None: The reason the file is rejected, or None when it is valid.
+    """
+    if len(content) > MAX_FILE_BYTES:
+        return "Payload Too Large"
+    if not content.startswith(b"%PDF"):
+        return "File is not a PDF"
+    return None
+
+
+def processa_em_paralelo(
+    pool: ParserPool, contents: list[bytes], engine: str = ENGINES[0]
+) -> list[ExamDocument | Exception]:
+    """
+    This function parses several PDF documents concurrently in the shared
+    parser pool, merging the worker timings into the current trace. A
+    failure in one document does not affect the others.
+
+    A batch larger than the pool waits for its own documents to free their
+    slots; a document that finds the pool full with none of the batch in
+    progress (the slots are all taken by other requests) is not parsed and
+    gets QueueFull as its result.
+
+    Parameters:
+    pool (ParserPool): The parser pool of the instance.
+    contents (list[bytes]): The contents of the PDF documents.
+    engine (str): The extraction engine, see get_document_from_pdf_exam.
+
+    Returns:
+    list[ExamDocument | Exception]: For each document, in order, the parsed
+    document or the exception raised while parsing or queueing it.
+    """
+    logger.info(f"Processing {len(contents)} files in the parser pool")
+    futures: list[Future[Any] | Exception] = []
+    for content in contents:
+        em_andamento = any(isinstance(f, Future) and not f.done() for f in futures)
+        try:
+            futures.append(
+                pool.submit(
+                    processa_no_worker,
+                    content,
+                    engine,
+                    timeout=RETRY_AFTER_MAX if em_andamento else 0,
+                )
+            )
+        except QueueFull as e:
+            futures.append(e)
+
+    results: list[ExamDocument | Exception] = []
+    for future in futures:
+        if isinstance(future, Exception):
+            results.append(future)
+            continue
+        try:
+            document, worker_trace = future.result()
+        except Exception as e:
+            results.append(e)
+            continue
+        timing.merge(worker_trace)
+        results.append(document)
+    return results
+
+
+def grava_em_lotes(
+    client: "Client", collection: str, documents: list[tuple[str, ExamDocument]]
+) -> None:
+    """
+    This function writes the documents to a Firestore collection using
+    batched writes of at most FIRESTORE_BATCH_LIMIT documents each.
+
+    Parameters:
+    client (Client): The Firestore client.
+    collection (str): The path of the collection.
+    documents (list[tuple[str, ExamDocument]]): The id and the content of
+    each document.
+    """
+    for start in range(0, len(documents), FIRESTORE_BATCH_LIMIT):
+        chunk = documents[start : start + FIRESTORE_BATCH_LIMIT]
+        batch = client.batch()
+        for document_id, document in chunk:
+            batch.set(client.collection(collection).document(document_id), document)
+        logger.info(f"Committing {len(chunk)} documents to {collection}")
+        batch.commit()
@@ -0,0 +1,173 @@
+import json
+import pickle
+from collections import OrderedDict
+from collections.abc import Callable
+from hashlib import sha256
+from pathlib import Path
+from threading import Lock
+from typing import Any, Protocol
+
+from firebase_functions import logger
+
+from src.documents import ENGINES, PARSER_VERSION, ExamDocument
+
+
+def chave_do_exame(content: bytes, engine: str = ENGINES[0]) -> str:
+    """
+    This function computes the cache key of an uploaded exam: the SHA-256
+    digest of its bytes, prefixed by the parser version, so that a parser
+    upgrade never serves results produced by an older parser.
+
+    Parameters:
+    content (bytes): The content of the PDF document as bytes.
+    engine (str): The extraction engine; documents parsed by an engine
+    other than the default one are cached under their own keys.
+
+    Returns:
+    str: The cache key, usable as a Firestore document id.
+    """
+    return chave_do_digest(sha256(content).hexdigest(), engine)
+
+
+def chave_do_digest(digest: str, engine: str = ENGINES[0]) -> str:
+    """
+    Returns the cache key of an exam whose SHA-256 hex digest is already
+    known, e.g. computed while streaming the upload.
+    """
+    if engine != ENGINES[0]:
+        return f"v{PARSER_VERSION}-{engine}-{digest}"
+    return f"v{PARSER_VERSION}-{digest}"
+
+
+def tamanho_do_documento(document: ExamDocument) -> int:
+    """
+    This function estimates the size in bytes of a parsed document,
+    used for the size-based eviction of the in-process tier.
+    """
+    return len(json.dumps(document, default=str))
+
+
+class CacheStore(Protocol):
+    """Persistent tier of the ExamCache."""
+
+    def get(self, key: str) -> ExamDocument | None: ...
+
+    def set(self, key: str, document: ExamDocument) -> None: ...
+
+
+class FirestoreCacheStore:
+    """
+    Persistent tier backed by a Firestore collection, one document per key.
+    The Firestore client is only created on first use, by calling client
+    (firebase_admin.firestore.client by default).
+    """
+
+    def __init__(
+        self,
+        collection: str = "exam_cache",
+        client: Callable[[], Any] | None = None,
+    ) -> None:
+        self.collection = collection
+        self._client = client
+
+    def _collection(self) -> Any:
+        if self._client is None:
+            from firebase_admin import firestore
+
+            self._client = firestore.client
+        return self._client().collection(self.collection)
+
+    def get(self, key: str) -> ExamDocument | None:
+        snapshot = self._collection().document(key).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    def set(self, key: str, document: ExamDocument) -> None:
+        self._collection().document(key).set(document)
+
+
+class DiskCacheStore:
+    """Persistent tier backed by a local directory, one pickle file per key."""
+
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: str) -> ExamDocument | None:
+        path = self.directory / f"{key}.pickle"
+        if not path.exists():
+            return None
+        with path.open("rb") as file:
+            document: ExamDocument = pickle.load(file)
+        return document
+
+    def set(self, key: str, document: ExamDocument) -> None:
+        path = self.directory / f"{key}.pickle"
+        temp = path.with_suffix(".tmp")
+        with temp.open("wb") as file:
+            pickle.dump(document, file)
+        temp.replace(path)  # escrita atômica
+
+
+class ExamCache:
+    """
+    Two-tier cache of parsed exam documents keyed by chave_do_exame.
+    The first tier is an in-process LRU bounded by the estimated size of the
+    documents; the optional second tier is a persistent CacheStore whose hits
+    are promoted to the first tier.
+    """
+
+    def __init__(
+        self, max_bytes: int = 64_000_000, store: CacheStore | None = None
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[ExamDocument, int]] = OrderedDict()
+        self._bytes = 0
+        self._lock = Lock()
+
+    def get(self, key: str) -> ExamDocument | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        document = None
+        if self.store is not None:
+            try:
+                document = self.store.get(key)
+            except Exception as e:
+                logger.warn(f"Erro ao ler cache persistente: {str(e)}")
+        with self._lock:
+            if document is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self._remember(key, document)
+        return document
+
+    def set(self, key: str, document: ExamDocument) -> None:
+        self._remember(key, document)
+        if self.store is not None:
+            try:
+                self.store.set(key, document)
+            except Exception as e:
+                logger.warn(f"Erro ao gravar cache persistente: {str(e)}")
+
+    def _remember(self, key: str, document: ExamDocument) -> None:
+        size = tamanho_do_documento(document)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (document, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,148 @@
+"""
+Compact columnar encoding of parsed exams for Firestore. The plain layout
+(df.to_dict(orient="list")) repeats every unit, reference text, Ficha and
+date on each row; here each column is stored as one of:
+
+- "float"/"int": the values packed little-endian into a single bytes field
+  (missing values as NaN, None kept in a list of indexes);
+- "bool": one byte per row;
+- "dict": the distinct values stored once plus one packed code per row,
+  used for strings, dates and anything else, and for numeric columns with
+  few distinct values (e.g. reference limits), whichever is smaller.
+
+Decoding needs neither pandas nor pymupdf.
+"""
+
+import sys
+from array import array
+from typing import Any
+
+from src.documents import ExamDocument
+
+SCHEMA_FIELD = "_schema"
+COMPACT_SCHEMA = "compact/1"  # incrementar se o formato mudar
+CODE_TYPES = ["B", "H", "I"]  # menor tipo sem sinal que comporta os códigos
+
+
+def _empacota(typecode: str, values: list[Any]) -> bytes:
+    packed = array(typecode, values)
+    if sys.byteorder != "little":  # bytes sempre little-endian no Firestore
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _desempacota(typecode: str, data: bytes) -> list[Any]:
+    packed = array(typecode)
+    packed.frombytes(data)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return packed.tolist()
+
+
+def _e_nan(value: Any) -> bool:
+    return bool(value != value)  # NaN e NaT são diferentes de si mesmos
+
+
+def _dicionario(values: list[Any]) -> dict[str, Any]:
+    distinct: list[Any] = []
+    index: dict[Any, int] = {}
+    codes = []
+    for value in values:
+        key = "NaN" if value is not None and _e_nan(value) else value
+        key = (type(key).__name__, key)  # não confunde 1, 1.0 e True
+        if key not in index:
+            index[key] = len(distinct)
+            distinct.append(value)
+        codes.append(index[key])
+    typecode = next(
+        t for t in CODE_TYPES if len(distinct) <= 2 ** (8 * array(t).itemsize)
+    )
+    return {
+        "type": "dict",
+        "values": distinct,
+        "codes": _empacota(typecode, codes),
+        "code_type": typecode,
+    }
+
+
+def _codifica_coluna(values: list[Any]) -> dict[str, Any]:
+    present = [v for v in values if v is not None and not _e_nan(v)]
+    nulls = [i for i, v in enumerate(values) if v is None]
+    if present and all(isinstance(v, bool) for v in present) and not nulls:
+        return {"type": "bool", "data": bytes(bool(v) for v in values)}
+    numbers = all(
+        isinstance(v, int | float) and not isinstance(v, bool) for v in present
+    )
+    if not present or not numbers:
+        return _dicionario(values)
+
+    if all(isinstance(v, int) for v in present) and len(present) == len(values):
+        packed = {"type": "int", "data": _empacota("q", values)}
+    else:
+        floats = [float("nan") if v is None else float(v) for v in values]
+        packed = {"type": "float", "data": _empacota("d", floats), "nulls": nulls}
+    # limites de referência se repetem a cada data: o dicionário sai menor
+    dicionario = _dicionario(values)
+    if len(dicionario["codes"]) + 8 * len(dicionario["values"]) < len(packed["data"]):
+        return dicionario
+    return packed
+
+
+def _decodifica_coluna(column: dict[str, Any]) -> list[Any]:
+    kind = column["type"]
+    if kind == "bool":
+        return [bool(b) for b in column["data"]]
+    if kind == "int":
+        return _desempacota("q", column["data"])
+    if kind == "float":
+        values = _desempacota("d", column["data"])
+        for i in column.get("nulls", []):
+            values[i] = None
+        return values
+    if kind == "dict":
+        distinct = column["values"]
+        return [distinct[c] for c in _desempacota(column["code_type"], column["codes"])]
+    raise ValueError(f"Unknown compact column type: {kind}")
+
+
+def codifica_documento(document: ExamDocument) -> dict[str, Any]:
+    """
+    This function encodes a parsed exam in the compact columnar layout.
+
+    Parameters:
+    document (ExamDocument): The column-oriented parsed exam.
+
+    Returns:
+    dict[str, Any]: The Firestore document, with the schema version in
+    SCHEMA_FIELD, the number of rows and one encoded entry per column.
+    """
+    rows = len(next(iter(document.values()), []))
+    return {
+        SCHEMA_FIELD: COMPACT_SCHEMA,
+        "rows": rows,
+        "column_order": list(document),
+        "columns": {name: _codifica_coluna(list(v)) for name, v in document.items()},
+    }
+
+
+def decodifica_documento(stored: dict[str, Any]) -> ExamDocument:
+    """
+    This function reads back an exam stored by send_exam in either layout:
+    compact documents are decoded, plain ones are returned unchanged.
+
+    Parameters:
+    stored (dict[str, Any]): The Firestore document.
+
+    Returns:
+    ExamDocument: The column-oriented exam, one list of values per column.
+
+    Raises:
+    ValueError: When the document has an unknown schema version.
+    """
+    schema = stored.get(SCHEMA_FIELD)
+    if schema is None:
+        return stored
+    if schema != COMPACT_SCHEMA:
+        raise ValueError(f"Unknown exam document schema: {schema}")
+    columns = stored["columns"]
+    return {name: _decodifica_coluna(columns[name]) for name in stored["column_order"]}
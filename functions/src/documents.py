@@ -0,0 +1,10 @@
+from typing import Any
+
+# Documento salvo no Firestore: uma lista de valores por coluna do DataFrame
+ExamDocument = dict[str, list[Any]]
+
+PARSER_VERSION = "3"  # incrementar sempre que a saída do parser mudar
+
+# Motores de extração das tabelas: find_tables do PyMuPDF ou as coordenadas
+# das palavras (src.palavras); o primeiro é o padrão
+ENGINES = ("tables", "words")
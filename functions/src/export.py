@@ -0,0 +1,301 @@
+"""
+Columnar export of the exams of one or more users as a stream of Arrow
+record batches (the Arrow IPC stream format) or Parquet row groups, one
+row per analyte and exam date, with a fixed schema: Data as a date,
+RESULTADOS and the limits as float64, ANALITOS and Unidade (and the uid)
+dictionary-encoded. The documents are read with a streaming query and
+converted EXPORT_BATCH_DOCUMENTS at a time, or fewer when they reach
+EXPORT_BATCH_ROWS rows, so the memory used grows neither with the number
+of exams nor with their size.
+
+Two sources can be exported: "exams", the reports as stored in
+users/{uid}/exams, where a date repeated by several evolutive reports
+appears once per report; and "analytes", the per-analyte time series of
+users/{uid}/analytes, one row per distinct observation, which is also the
+only copy of the exams sent with send_exam?mode=incremental.
+
+pyarrow is only imported when an export runs, keeping it out of the cold
+start of the other functions.
+"""
+
+from collections.abc import Iterable, Iterator
+from datetime import date
+from typing import TYPE_CHECKING, Any
+
+from firebase_functions import logger
+
+from src import timing
+from src.compact import decodifica_documento
+from src.documents import ExamDocument
+from src.resumo import ordem
+from src.series import OBSERVATION_FIELDS, SERIES_COLLECTION
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+EXPORT_FORMATS = ("arrow", "parquet")
+EXPORT_SOURCES = ("exams", "analytes")
+EXPORT_BATCH_DOCUMENTS = 200  # documentos por record batch / row group
+# 200 laudos grandes (3840 linhas cada) chegavam a 276 MB (tracemalloc) com
+# o Arrow; com 50000 linhas por lote, o pico fica em 21 MB
+EXPORT_BATCH_ROWS = 50_000
+CONTENT_TYPES = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+EXTENSIONS = {"arrow": "arrows", "parquet": "parquet"}
+
+TEXT_COLUMNS = ["VALORES DE REFERÊNCIA", "Ficha"]
+NUMBER_COLUMNS = ["RESULTADOS", "Limite inferior", "Limite superior"]
+DICTIONARY_COLUMNS = ["ANALITOS", "Unidade"]
+AGE_COLUMN = "Referência varia com idade"
+
+
+def esquema() -> "pa.Schema":
+    """Returns the Arrow schema of the export, in column order."""
+    import pyarrow as pa
+
+    dictionary = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema(
+        [
+            ("uid", dictionary),
+            ("exam_id", pa.string()),
+            ("ANALITOS", dictionary),
+            ("RESULTADOS", pa.float64()),
+            ("VALORES DE REFERÊNCIA", pa.string()),
+            ("Ficha", pa.string()),
+            ("Data", pa.date32()),
+            (AGE_COLUMN, pa.bool_()),
+            ("Limite inferior", pa.float64()),
+            ("Limite superior", pa.float64()),
+            ("Unidade", dictionary),
+        ]
+    )
+
+
+def _vazio(value: Any) -> bool:
+    # None, NaN e NaT
+    return value is None or bool(value != value)
+
+
+def _numero(value: Any) -> float | None:
+    if _vazio(value) or isinstance(value, bool) or not isinstance(value, int | float):
+        return None
+    return float(value)
+
+
+def _texto(value: Any) -> str | None:
+    return None if _vazio(value) else str(value)
+
+
+def _dia(value: Any) -> date | None:
+    # datas do parser (Timestamp sem fuso) ou lidas do Firestore (UTC)
+    if _vazio(value):
+        return None
+    dia: date = value.date() if hasattr(value, "date") else value
+    return dia
+
+
+def documento_da_serie(serie: dict[str, Any]) -> ExamDocument:
+    """
+    This function turns the time series of an analyte (see mescla_series)
+    into a column-oriented document, one row per observation by date.
+    """
+    observacoes = sorted(serie.get("observations", {}).values(), key=ordem)
+    colunas = ["Ficha", "Data", *OBSERVATION_FIELDS]
+    document: ExamDocument = {"ANALITOS": [serie.get("name")] * len(observacoes)}
+    for coluna in colunas:
+        document[coluna] = [o.get(coluna) for o in observacoes]
+    return document
+
+
+def colunas_do_exame(
+    uid: str, exam_id: str | None, document: ExamDocument
+) -> dict[str, list]:
+    """
+    This function converts one column-oriented exam to the export columns:
+    values are coerced to the type of their column (a value that does not
+    fit, such as a text result, becomes null), missing columns are filled
+    with nulls and columns outside the schema are left out.
+
+    Parameters:
+    uid (str): The id of the owner of the exam.
+    exam_id (str | None): The id of the exam document, None for the rows
+    of a time series.
+    document (ExamDocument): The column-oriented exam.
+
+    Returns:
+    dict[str, list]: One list of values per column of esquema().
+    """
+    rows = len(next(iter(document.values()), []))
+
+    def coluna(name: str, converte: Any) -> list:
+        values = document.get(name)
+        return [converte(v) for v in values] if values else [None] * rows
+
+    colunas: dict[str, list] = {"uid": [uid] * rows, "exam_id": [exam_id] * rows}
+    for name in DICTIONARY_COLUMNS + TEXT_COLUMNS:
+        colunas[name] = coluna(name, _texto)
+    for name in NUMBER_COLUMNS:
+        colunas[name] = coluna(name, _numero)
+    colunas["Data"] = coluna("Data", _dia)
+    colunas[AGE_COLUMN] = coluna(AGE_COLUMN, lambda v: None if _vazio(v) else bool(v))
+    return colunas
+
+
+def lotes(
+    client: Any,
+    uids: Iterable[str],
+    documentos: int = EXPORT_BATCH_DOCUMENTS,
+    fonte: str = EXPORT_SOURCES[0],
+    linhas: int = EXPORT_BATCH_ROWS,
+) -> Iterator["pa.RecordBatch"]:
+    """
+    This function streams the documents of the users, the exams (in either
+    stored layout) or the analyte time series, and yields them as record
+    batches of at most documentos documents each, closed earlier once they
+    reach linhas rows. Exams that can not be decoded are logged and skipped.
+
+    Parameters:
+    client (Any): The Firestore client (or an in-memory stand-in).
+    uids (Iterable[str]): The ids of the users to export.
+    documentos (int): The maximum number of documents per record batch.
+    fonte (str): One of EXPORT_SOURCES.
+    linhas (int): The number of rows that closes a record batch.
+
+    Returns:
+    Iterator[pa.RecordBatch]: The record batches, with the schema of
+    esquema().
+
+    Raises:
+    ValueError: When the source is not one of EXPORT_SOURCES.
+    """
+    import pyarrow as pa
+
+    if fonte not in EXPORT_SOURCES:
+        raise ValueError(f"Invalid source: {fonte}")
+    collection = "exams" if fonte == "exams" else SERIES_COLLECTION
+    schema = esquema()
+    pendentes: dict[str, list] = {name: [] for name in schema.names}
+
+    def fecha() -> "pa.RecordBatch":
+        with timing.stage("to_arrow"):
+            batch = pa.RecordBatch.from_pydict(pendentes, schema=schema)
+        timing.count("rows", batch.num_rows)
+        return batch
+
+    n = 0
+    for uid in uids:
+        snapshots = iter(client.collection(f"users/{uid}/{collection}").stream())
+        while True:
+            with timing.stage("firestore_read"):
+                snapshot = next(snapshots, None)
+            if snapshot is None:
+                break
+            data = snapshot.to_dict() or {}
+            if fonte == "analytes":
+                document, exam_id = documento_da_serie(data), None
+            else:
+                try:
+                    document, exam_id = decodifica_documento(data), snapshot.id
+                except ValueError as e:
+                    logger.warn(f"Skipping exam {snapshot.id} of {uid}: {str(e)}")
+                    continue
+            for name, values in colunas_do_exame(uid, exam_id, document).items():
+                pendentes[name].extend(values)
+            n += 1
+            timing.count("documents")
+            if n == documentos or len(pendentes["uid"]) >= linhas:
+                yield fecha()
+                pendentes, n = {name: [] for name in schema.names}, 0
+    if n:
+        yield fecha()
+
+
+class _Saida:
+    """Write-only file object that keeps what was written until drained."""
+
+    def __init__(self) -> None:
+        self.chunks: list[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drena(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def transmite(batches: Iterable["pa.RecordBatch"], formato: str) -> Iterator[bytes]:
+    """
+    This function serializes record batches as they come, yielding the
+    bytes written for each one: an Arrow IPC stream (the dictionaries of
+    each batch sent along with it) or a Parquet file with one row group per
+    batch, whose footer comes with the last chunk.
+
+    Parameters:
+    batches (Iterable[pa.RecordBatch]): The batches, with the schema of
+    esquema().
+    formato (str): One of EXPORT_FORMATS.
+
+    Returns:
+    Iterator[bytes]: The chunks of the serialized export.
+
+    Raises:
+    ValueError: When the format is not one of EXPORT_FORMATS.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if formato not in EXPORT_FORMATS:
+        raise ValueError(f"Invalid format: {formato}")
+    saida = _Saida()
+    schema = esquema()
+    writer: Any
+    if formato == "arrow":
+        writer = pa.ipc.new_stream(saida, schema)
+    else:
+        writer = pq.ParquetWriter(saida, schema)
+    with writer:
+        yield saida.drena()
+        for batch in batches:
+            with timing.stage("serialize"):
+                if formato == "arrow":
+                    writer.write_batch(batch)
+                else:
+                    writer.write_table(pa.Table.from_batches([batch]))
+            yield saida.drena()
+    yield saida.drena()
+
+
+def exporta(
+    client: Any,
+    uids: Iterable[str],
+    formato: str = EXPORT_FORMATS[0],
+    documentos: int = EXPORT_BATCH_DOCUMENTS,
+    fonte: str = EXPORT_SOURCES[0],
+    linhas: int = EXPORT_BATCH_ROWS,
+) -> Iterator[bytes]:
+    """
+    Streams the documents of fonte (see lotes) serialized in formato (see
+    transmite).
+    """
+    batches = lotes(client, uids, documentos, fonte, linhas)
+    for chunk in transmite(batches, formato):
+        if chunk:
+            timing.count("bytes", len(chunk))
+            yield chunk
@@ -0,0 +1,154 @@
+from datetime import datetime, timezone
+from hashlib import sha256
+from typing import Any
+from uuid import uuid4
+
+from firebase_functions import logger
+
+from src import timing
+from src.cache import ExamCache, chave_do_digest, chave_do_exame
+from src.resumo import atualiza_leitura
+
+UPLOADS_PREFIX = "exam_uploads"
+
+
+def caminho_do_upload(uid: str, job_id: str) -> str:
+    """Returns the Storage path where the raw PDF of a job is kept."""
+    return f"{UPLOADS_PREFIX}/{uid}/{job_id}.pdf"
+
+
+def le_caminho_do_upload(path: str) -> tuple[str, str] | None:
+    """
+    This function reads the user id and the job id back from a Storage path
+    created by caminho_do_upload.
+
+    Returns:
+    tuple[str, str] | None: The user id and the job id, or None when the path
+    is not an exam upload.
+    """
+    partes = path.split("/")
+    if len(partes) != 3 or partes[0] != UPLOADS_PREFIX:
+        return None
+    if not partes[1] or not partes[2].endswith(".pdf") or partes[2] == ".pdf":
+        return None
+    return partes[1], partes[2].removesuffix(".pdf")
+
+
+def job_ref(client: Any, uid: str, job_id: str) -> Any:
+    return client.collection("users/" + uid + "/jobs").document(job_id)
+
+
+def cria_job(
+    client: Any, bucket: Any, uid: str, content: bytes, digest: str | None = None
+) -> str:
+    """
+    This function queues an exam for asynchronous processing: it creates the
+    job status document and stores the raw bytes in Cloud Storage, whose
+    upload triggers processa_job.
+
+    Parameters:
+    client (Any): The Firestore client (or an in-memory stand-in).
+    bucket (Any): The Storage bucket (or an in-memory stand-in).
+    uid (str): The id of the user that sent the exam.
+    content (bytes): The content of the PDF document as bytes.
+    digest (str | None): The SHA-256 hex digest of content, when already
+    computed while reading it (see le_corpo).
+
+    Returns:
+    str: The id of the job.
+    """
+    job_id = uuid4().hex
+    if digest is None:
+        digest = sha256(content).hexdigest()
+    job_ref(client, uid, job_id).set(
+        {
+            "status": "queued",
+            "created_at": datetime.now(tz=timezone.utc),
+            "bytes": len(content),
+            "digest": digest,
+            "key": chave_do_digest(digest),
+        }
+    )
+    logger.info(f"Uploading job {job_id} to Storage")
+    bucket.blob(caminho_do_upload(uid, job_id)).upload_from_string(
+        content, content_type="application/pdf"
+    )
+    return job_id
+
+
+def processa_job(
+    client: Any,
+    uid: str,
+    job_id: str,
+    content: bytes,
+    cache: ExamCache | None = None,
+) -> str | None:
+    """
+    This function parses a queued exam, saves it to the user's exams and
+    records the outcome in the job status document. Storage events are
+    delivered at least once, so it is idempotent: a job already done is not
+    processed again, and the exam is saved with the job id as its document
+    id, so two concurrent deliveries write the same document.
+
+    Parameters:
+    client (Any): The Firestore client (or an in-memory stand-in).
+    uid (str): The id of the user that sent the exam.
+    job_id (str): The id of the job.
+    content (bytes): The content of the PDF document as bytes.
+    cache (ExamCache | None): The cache of parsed exams, if any.
+
+    Returns:
+    str | None: The id of the saved exam document, or None when it failed.
+    """
+    job = job_ref(client, uid, job_id)
+    snapshot = job.get()
+    estado = (snapshot.to_dict() or {}) if snapshot.exists else {}
+    if estado.get("status") == "done":
+        logger.info(f"Job {job_id} already done, ignoring the repeated event")
+        exam_id = estado.get("exam_id")
+        return str(exam_id) if exam_id is not None else None
+    job.set(
+        {"status": "processing", "started_at": datetime.now(tz=timezone.utc)},
+        merge=True,
+    )
+    try:
+        # o digest foi calculado no send_exam_async; só jobs antigos não o têm
+        digest = estado.get("digest")
+        key = chave_do_digest(digest) if digest else chave_do_exame(content)
+        document = cache.get(key) if cache is not None else None
+        cache_status = "hit" if document is not None else "miss"
+        if document is None:
+            # pandas e pymupdf só são carregados quando há o que processar
+            from src.utils import get_document_from_pdf_exam
+
+            logger.info(f"Processing job {job_id}")
+            document = get_document_from_pdf_exam(content)
+            if cache is not None:
+                cache.set(key, document)
+        with timing.stage("firestore_write"):
+            doc_ref = client.collection("users/" + uid + "/exams").document(job_id)
+            doc_ref.set(document)
+        with timing.stage("summary_write"):
+            atualiza_leitura(client, uid, [document])
+    except Exception as e:
+        logger.error(f"Error processing job {job_id}: {str(e)}")
+        job.set(
+            {
+                "status": "error",
+                "message": str(e),
+                "finished_at": datetime.now(tz=timezone.utc),
+            },
+            merge=True,
+        )
+        return None
+    job.set(
+        {
+            "status": "done",
+            "exam_id": doc_ref.id,
+            "cache": cache_status,
+            "finished_at": datetime.now(tz=timezone.utc),
+        },
+        merge=True,
+    )
+    logger.info(f"Job {job_id} done")
+    return str(doc_ref.id)
@@ -0,0 +1,273 @@
+"""
+In-memory stand-ins for the subset of the Firestore and Cloud Storage
+clients used by the functions, and a fake Firebase Auth verifier, for
+running the pipeline locally without credentials or the Firebase emulator.
+"""
+
+import time
+from collections.abc import Callable, Iterator
+from copy import deepcopy
+from datetime import datetime, timezone
+from threading import RLock
+from typing import Any
+from uuid import uuid4
+
+from src.cache import ExamCache
+from src.jobs import le_caminho_do_upload, processa_job
+from src.tokens import TokenUser, TokenVerifier
+
+
+def mescla(current: dict[str, Any], data: dict[str, Any]) -> dict[str, Any]:
+    """
+    Merges data into current like Firestore's set(merge=True): nested maps
+    are merged key by key instead of replaced.
+    """
+    merged = dict(current)
+    for key, value in data.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = mescla(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+class InMemorySnapshot:
+    def __init__(self, reference: "InMemoryDocument", data: dict[str, Any] | None):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self) -> dict[str, Any] | None:
+        return deepcopy(self._data)
+
+
+class InMemoryDocument:
+    def __init__(self, client: "InMemoryFirestore", path: str) -> None:
+        self._client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def collection(self, name: str) -> "InMemoryCollection":
+        return InMemoryCollection(self._client, f"{self.path}/{name}")
+
+    def get(self, transaction: Any = None) -> InMemorySnapshot:
+        with self._client.lock:
+            return InMemorySnapshot(self, self._client.documents.get(self.path))
+
+    def set(self, data: dict[str, Any], merge: bool = False) -> None:
+        with self._client.lock:
+            current = self._client.documents.get(self.path) if merge else None
+            self._client.documents[self.path] = mescla(current or {}, deepcopy(data))
+
+    def update(self, data: dict[str, Any]) -> None:
+        with self._client.lock:
+            if self.path not in self._client.documents:
+                raise KeyError(f"No document to update: {self.path}")
+            self._client.documents[self.path].update(deepcopy(data))
+
+    def delete(self) -> None:
+        with self._client.lock:
+            self._client.documents.pop(self.path, None)
+
+
+class InMemoryCollection:
+    def __init__(self, client: "InMemoryFirestore", path: str) -> None:
+        self._client = client
+        self.path = path.strip("/")
+        self.id = self.path.rsplit("/", 1)[-1]
+
+    def document(self, document_id: str | None = None) -> InMemoryDocument:
+        return InMemoryDocument(
+            self._client, f"{self.path}/{document_id or uuid4().hex}"
+        )
+
+    def add(
+        self, data: dict[str, Any], document_id: str | None = None
+    ) -> tuple[datetime, InMemoryDocument]:
+        reference = self.document(document_id)
+        reference.set(data)
+        return datetime.now(tz=timezone.utc), reference
+
+    def stream(self) -> Iterator[InMemorySnapshot]:
+        prefix = self.path + "/"
+        with self._client.lock:
+            paths = sorted(
+                path
+                for path in self._client.documents
+                if path.startswith(prefix) and "/" not in path[len(prefix) :]
+            )
+        for path in paths:
+            yield InMemoryDocument(self._client, path).get()
+
+
+class InMemoryBatch:
+    def __init__(self, client: "InMemoryFirestore") -> None:
+        self._client = client
+        self._writes: list[tuple[InMemoryDocument, dict[str, Any], bool]] = []
+
+    def set(
+        self, reference: InMemoryDocument, data: dict[str, Any], merge: bool = False
+    ) -> None:
+        self._writes.append((reference, data, merge))
+
+    def commit(self) -> None:
+        with self._client.lock:  # aplica todas as escritas atomicamente
+            for reference, data, merge in self._writes:
+                reference.set(data, merge=merge)
+        self._writes = []
+
+
+class InMemoryTransaction(InMemoryBatch):
+    """
+    Stand-in for google.cloud.firestore.Transaction, run by the
+    google.cloud.firestore.transactional decorator: the transactions of a
+    client run one at a time, from _begin to _commit or _rollback, and their
+    writes are applied on commit.
+    """
+
+    _max_attempts = 1
+    _read_only = False
+
+    def __init__(self, client: "InMemoryFirestore") -> None:
+        super().__init__(client)
+        self._id: bytes | None = None
+
+    def _clean_up(self) -> None:
+        self._writes = []
+        if self._id is not None:
+            self._id = None
+            self._client.transaction_lock.release()
+
+    def _begin(self, retry_id: bytes | None = None) -> None:
+        self._client.transaction_lock.acquire()
+        self._id = uuid4().bytes
+
+    def _commit(self) -> None:
+        try:
+            self.commit()
+        finally:
+            self._clean_up()
+
+    def _rollback(self) -> None:
+        self._clean_up()
+
+
+class InMemoryFirestore:
+    """Stand-in for google.cloud.firestore.Client."""
+
+    def __init__(self) -> None:
+        self.documents: dict[str, dict[str, Any]] = {}
+        self.lock = RLock()
+        self.transaction_lock = RLock()
+
+    def collection(self, path: str) -> InMemoryCollection:
+        return InMemoryCollection(self, path)
+
+    def document(self, path: str) -> InMemoryDocument:
+        return InMemoryDocument(self, path.strip("/"))
+
+    def batch(self) -> InMemoryBatch:
+        return InMemoryBatch(self)
+
+    def transaction(self) -> InMemoryTransaction:
+        return InMemoryTransaction(self)
+
+    def get_all(self, references: list[InMemoryDocument]) -> Iterator[InMemorySnapshot]:
+        for reference in references:
+            yield reference.get()
+
+
+class InMemoryBlob:
+    def __init__(self, bucket: "InMemoryBucket", name: str) -> None:
+        self.bucket = bucket
+        self.name = name
+
+    def upload_from_string(
+        self, data: bytes, content_type: str = "application/octet-stream"
+    ) -> None:
+        self.bucket.blobs[self.name] = bytes(data)
+        if self.bucket.on_finalize is not None:
+            self.bucket.on_finalize(self.bucket.name, self.name)
+
+    def download_as_bytes(self) -> bytes:
+        return self.bucket.blobs[self.name]
+
+    def exists(self) -> bool:
+        return self.name in self.bucket.blobs
+
+    def delete(self) -> None:
+        del self.bucket.blobs[self.name]
+
+
+class InMemoryBucket:
+    """
+    Stand-in for google.cloud.storage.Bucket. on_finalize, when given, is
+    called with the bucket and object names after every upload, like the
+    object finalized trigger of Cloud Storage.
+    """
+
+    def __init__(
+        self,
+        name: str = "local-bucket",
+        on_finalize: Callable[[str, str], None] | None = None,
+    ) -> None:
+        self.name = name
+        self.on_finalize = on_finalize
+        self.blobs: dict[str, bytes] = {}
+
+    def blob(self, name: str) -> InMemoryBlob:
+        return InMemoryBlob(self, name)
+
+    def list_blobs(self, prefix: str = "") -> list[InMemoryBlob]:
+        return [
+            InMemoryBlob(self, n) for n in sorted(self.blobs) if n.startswith(prefix)
+        ]
+
+
+def verifica_token_local(token: str) -> dict[str, Any]:
+    """
+    Fake auth.verify_id_token for local runs: any non-empty token is
+    accepted and used as the uid, so "Bearer alice" is user alice.
+
+    Raises:
+    ValueError: When the token is empty.
+    """
+    if not token:
+        raise ValueError("Empty token")
+    return {"uid": token, "email": f"{token}@local", "exp": time.time() + 3600}
+
+
+def cria_verificador_local() -> TokenVerifier:
+    """
+    This function builds a TokenVerifier that checks tokens with
+    verifica_token_local instead of Firebase Auth.
+    """
+    return TokenVerifier(
+        verify_id_token=verifica_token_local,
+        get_user=lambda uid: TokenUser(verifica_token_local(uid)),
+    )
+
+
+def cria_pipeline_assincrono_em_memoria(
+    cache: ExamCache | None = None,
+) -> tuple[InMemoryFirestore, InMemoryBucket]:
+    """
+    This function wires an in-memory Firestore and bucket so that every
+    upload made by cria_job runs processa_job right away, like the
+    process_exam_upload trigger does in production.
+
+    Returns:
+    tuple[InMemoryFirestore, InMemoryBucket]: The client and the bucket to
+    pass to cria_job.
+    """
+    client = InMemoryFirestore()
+
+    def on_finalize(bucket_name: str, name: str) -> None:
+        upload = le_caminho_do_upload(name)
+        if upload is not None:
+            uid, job_id = upload
+            processa_job(client, uid, job_id, bucket.blobs[name], cache=cache)
+
+    bucket = InMemoryBucket(on_finalize=on_finalize)
+    return client, bucket
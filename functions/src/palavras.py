@@ -0,0 +1,199 @@
+"""
+Extraction of the exam tables from the word coordinates of a page, an
+alternative to find_tables for the fixed layout of the lab reports: the
+words are read once with page.get_text("words") and assigned to columns
+by their x coordinate, anchored on the ANALITOS / RESULTADOS / VALORES DE
+REFERÊNCIA header and on the Ficha/Data header of each exam date.
+"""
+
+import re
+from bisect import bisect_right
+from collections.abc import Sequence
+from typing import Any
+
+from pandas import DataFrame
+from pymupdf import Page
+
+Word = Sequence[Any]  # (x0, y0, x1, y1, texto, bloco, linha, palavra)
+
+ANALITOS = "ANALITOS"
+RESULTADOS = "RESULTADOS"
+VALORES = "VALORES"
+REFERENCIA = "VALORES DE REFERÊNCIA"
+DATE_PATTERN = re.compile(r"\d{2}/\d{2}/\d{4}")
+COLUMN_TOLERANCE = 3  # pontos à esquerda do início da coluna
+LINE_TOLERANCE = 0.5  # em alturas de palavra
+MAX_HEADER_LINES = 4  # linhas entre o cabeçalho e a linha das datas
+# espaço mínimo entre palavras de colunas diferentes, em alturas de palavra:
+# maior que o espaço entre palavras de um texto corrido
+CELL_GAP = 0.4
+
+
+def agrupa_linhas(words: list[Word]) -> list[list[Word]]:
+    """
+    This function groups words into text lines: a word starts a new line
+    when its top is more than LINE_TOLERANCE word heights below the top of
+    the current line.
+
+    Returns:
+    list[list[Word]]: The lines from top to bottom, each sorted by x.
+    """
+    linhas: list[list[Word]] = []
+    for word in sorted(words, key=lambda w: (w[1], w[0])):
+        if linhas and word[1] - linhas[-1][0][1] <= LINE_TOLERANCE * (
+            word[3] - word[1]
+        ):
+            linhas[-1].append(word)
+        else:
+            linhas.append([word])
+    return [sorted(linha, key=lambda w: w[0]) for linha in linhas]
+
+
+def _na_mesma_linha(word: Word, anchor: Word) -> bool:
+    return bool(abs(word[1] - anchor[1]) <= LINE_TOLERANCE * (anchor[3] - anchor[1]))
+
+
+def _texto(words: list[Word]) -> str:
+    return " ".join(w[4] for w in words)
+
+
+def _tabela(linhas: list[list[Word]], anchor: Word) -> DataFrame | None:
+    """
+    Builds the raw frame of one table from its lines, the first being the
+    header line with the ANALITOS anchor, up to the first line that does not
+    line up with the columns (e.g. a footer). Returns None when the layout
+    is not recognized.
+    """
+    header = linhas[0]
+    resultados = [w for w in header if w[4] == RESULTADOS and w[0] > anchor[0]]
+    valores = [w for w in header if w[4] == VALORES and w[0] > anchor[0]]
+    if not resultados or not valores:
+        return None
+    inicio, fim = resultados[0][0] - COLUMN_TOLERANCE, valores[0][0]
+
+    # linhas da Ficha/Data de cada exame, até a linha das datas
+    cabecalho: list[list[Word]] = []
+    datas: list[Word] = []
+    for linha in linhas[1 : 1 + MAX_HEADER_LINES]:
+        cabecalho.append(linha)
+        datas = [
+            w for w in linha if DATE_PATTERN.fullmatch(w[4]) and inicio <= w[0] < fim
+        ]
+        if datas:
+            break
+    if not datas:
+        return None
+
+    # limites das colunas: resultados a partir do cabeçalho RESULTADOS (ou da
+    # primeira data), cada data até o meio do espaço para a seguinte e a
+    # referência a partir do meio do espaço entre a última data e VALORES
+    limites = [min(inicio, datas[0][0] - COLUMN_TOLERANCE)]
+    for anterior, proxima in zip(datas, datas[1:], strict=False):
+        limites.append((anterior[2] + proxima[0]) / 2)
+    limites.append((datas[-1][2] + valores[0][0]) / 2)
+    n_colunas = len(limites) + 1
+
+    def alinhada(linha: list[Word]) -> bool:
+        # numa linha da tabela, palavras de colunas vizinhas ficam separadas
+        # pelo espaço entre as células; um rodapé ("Liberado eletronicamente
+        # por ...") atravessa os limites das colunas com um espaço comum
+        for anterior, word in zip(linha, linha[1:], strict=False):
+            if bisect_right(limites, anterior[0]) != bisect_right(
+                limites, word[0]
+            ) and word[0] - anterior[2] < CELL_GAP * (word[3] - word[1]):
+                return False
+        return True
+
+    def celulas(linhas_da_linha: list[list[Word]]) -> list[list[str]]:
+        partes: list[list[str]] = [[] for _ in range(n_colunas)]
+        for linha in linhas_da_linha:
+            por_coluna: list[list[Word]] = [[] for _ in range(n_colunas)]
+            for word in linha:
+                por_coluna[bisect_right(limites, word[0])].append(word)
+            for coluna, words in enumerate(por_coluna):
+                if words:
+                    partes[coluna].append(_texto(words))
+        return partes
+
+    # linha 0 como a do find_tables: Ficha\nData nas colunas de resultado e
+    # as células mescladas de ANALITOS e da referência vazias (None)
+    primeira: list[str | None] = [None] * n_colunas
+    for coluna, partes in enumerate(celulas(cabecalho)[1:-1], start=1):
+        primeira[coluna] = "\n".join(partes)
+    rows: list[list[str | None]] = [primeira]
+
+    # uma linha de texto logo abaixo da anterior continua a mesma célula
+    # (nome ou referência quebrados em duas linhas); a tabela acaba na
+    # primeira linha que não se alinha com as colunas
+    grupos: list[list[list[Word]]] = []
+    anterior_y1 = None
+    for linha in linhas[1 + len(cabecalho) :]:
+        if not alinhada(linha):
+            break
+        altura = max(w[3] - w[1] for w in linha)
+        y0 = min(w[1] for w in linha)
+        if (
+            grupos
+            and anterior_y1 is not None
+            and y0 - anterior_y1 < (LINE_TOLERANCE * altura)
+        ):
+            grupos[-1].append(linha)
+        else:
+            grupos.append([linha])
+        anterior_y1 = max(w[3] for w in linha)
+    for grupo in grupos:
+        linha_da_tabela = celulas(grupo)
+        # títulos de seção e rodapés: texto só na coluna ANALITOS
+        if not any(linha_da_tabela[1:]):
+            continue
+        rows.append(["\n".join(p) for p in linha_da_tabela])
+
+    columns = [ANALITOS, RESULTADOS]
+    columns += [f"Col{i}" for i in range(2, n_colunas - 1)]
+    columns.append(REFERENCIA)
+    return DataFrame(rows, columns=columns)
+
+
+def extrai_tabelas_por_palavras(page: Page) -> list[DataFrame] | None:
+    """
+    This function extracts the exam tables of a page from the coordinates
+    of its words, producing for each table the same frame that
+    find_tables().to_pandas() gives for the lab layout, without the junk
+    columns: the header row with Ficha\\nData of each exam date followed by
+    one row per analyte, ready for trata_colunas_iniciais.
+
+    Parameters:
+    page (Page): The page to process.
+
+    Returns:
+    list[DataFrame] | None: One raw frame per table, top to bottom; an
+    empty list when the page has no ANALITOS nor RESULTADOS header nor
+    dates, or None when the layout is not recognized (including tables
+    without header), so that the caller can fall back to find_tables.
+    """
+    words = page.get_text("words")
+    anchors = sorted((w for w in words if w[4] == ANALITOS), key=lambda w: w[1])
+    if not anchors:
+        # RESULTADOS sem ANALITOS, ou datas de uma tabela que continua da
+        # página anterior sem o cabeçalho: fica com o find_tables
+        continua = any(
+            w[4] == RESULTADOS or DATE_PATTERN.fullmatch(w[4]) for w in words
+        )
+        return None if continua else []
+
+    frames = []
+    for i, anchor in enumerate(anchors):
+        top = anchor[1] - LINE_TOLERANCE * (anchor[3] - anchor[1])
+        bottom = anchors[i + 1][1] if i + 1 < len(anchors) else float("inf")
+        header = [w for w in words if _na_mesma_linha(w, anchor)]
+        corpo = [
+            w
+            for w in words
+            if top <= w[1] < bottom - COLUMN_TOLERANCE
+            and not _na_mesma_linha(w, anchor)
+        ]
+        frame = _tabela([header, *agrupa_linhas(corpo)], anchor)
+        if frame is None:
+            return None
+        frames.append(frame)
+    return frames
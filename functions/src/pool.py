@@ -0,0 +1,183 @@
+import math
+import os
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from threading import BoundedSemaphore, Lock
+from typing import Any
+
+from firebase_functions import logger
+
+from src import timing
+from src.documents import ENGINES, ExamDocument
+
+RETRY_AFTER_MAX = 60  # segundos
+# processos por exame para extrair as páginas de laudos longos em paralelo
+# (ver get_initial_data); o padrão, 1, extrai as páginas no próprio worker.
+# Cada worker mantém seu pool de páginas aquecido, então a instância passa a
+# ter max_workers * (1 + PAGE_WORKERS) processos
+PAGE_WORKERS = int(os.environ.get("EXAM_PAGE_WORKERS", 1))
+
+
+class QueueFull(RuntimeError):
+    """Raised when the parser pool has no free slot; retry_after in seconds."""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__(f"Parser queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+def _aquece() -> None:
+    # carrega pandas e pymupdf uma vez por worker, não a cada exame
+    import src.utils  # noqa: F401
+
+
+def processa_no_worker(
+    content: bytes, engine: str = ENGINES[0]
+) -> tuple[ExamDocument, dict[str, Any]]:
+    """
+    This function is the entry point of the parser pool workers: it parses
+    a PDF document, split across PAGE_WORKERS processes when it is long
+    enough, and returns it with the stage timings of the worker, to be
+    merged into the trace of the request.
+    """
+    from src.utils import get_document_from_pdf_exam
+
+    with timing.tracing("parser_worker", emit=False) as trace:
+        document = get_document_from_pdf_exam(
+            content, max_workers=PAGE_WORKERS, engine=engine
+        )
+    return document, trace.export()
+
+
+class ParserPool:
+    """
+    Warm process pool for the parsing core, shared by the requests handled
+    concurrently by an instance. The worker processes are only started by
+    the first submission and are then reused across invocations.
+
+    At most max_workers documents are parsed at a time and at most
+    max_pending more wait in the queue; past that, submit raises QueueFull
+    instead of queueing, so the caller can answer 429 with a Retry-After
+    estimated from the recent parse durations. With max_workers=0 the
+    documents are parsed in the calling threads, one at a time, since
+    PyMuPDF is not thread-safe.
+    """
+
+    def __init__(
+        self, max_workers: int | None = None, max_pending: int | None = None
+    ) -> None:
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        self.max_workers = max_workers
+        self.max_pending = (
+            2 * max(max_workers, 1) if max_pending is None else max_pending
+        )
+        self._capacity = max(self.max_workers, 1) + self.max_pending
+        self._slots = BoundedSemaphore(self._capacity)
+        self._executor: ProcessPoolExecutor | None = None
+        self._lock = Lock()
+        self._inline_lock = Lock()
+        self.in_flight = 0
+        self._average_seconds = 1.0  # média móvel do tempo de cada exame no pool
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                logger.info(f"Starting parser pool with {self.max_workers} workers")
+                # spawn: o processo já tem threads (gRPC do Firestore, requests
+                # concorrentes) e fork não é seguro nesse caso
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=get_context("spawn"),
+                    initializer=_aquece,
+                )
+            return self._executor
+
+    def _reset(self) -> None:
+        """Drops a broken pool (e.g. a worker killed for memory)."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def retry_after(self) -> int:
+        """
+        Estimates when a slot frees up: with the pool full, a document spends
+        about capacity / max_workers parse durations in it.
+        """
+        rounds = math.ceil(self._capacity / max(self.max_workers, 1))
+        estimate = math.ceil(self._average_seconds / rounds)
+        return min(max(estimate, 1), RETRY_AFTER_MAX)
+
+    def _acquire(self, timeout: float = 0) -> None:
+        acquired = (
+            self._slots.acquire(timeout=timeout)
+            if timeout > 0
+            else self._slots.acquire(blocking=False)
+        )
+        if not acquired:
+            raise QueueFull(self.retry_after())
+        with self._lock:
+            self.in_flight += 1
+
+    def _release(self, seconds: float | None) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if seconds is not None:
+                self._average_seconds = 0.8 * self._average_seconds + 0.2 * seconds
+        self._slots.release()
+
+    def submit(
+        self, fn: Callable[..., Any], *args: Any, timeout: float = 0
+    ) -> "Future[Any]":
+        """
+        This function queues fn(*args) in the pool, waiting up to timeout
+        seconds for a free slot (by default, not at all).
+
+        Raises:
+        QueueFull: When max_workers + max_pending calls are already queued.
+        """
+        self._acquire(timeout)
+        start = time.perf_counter()
+        try:
+            if self.max_workers == 0:
+                future: Future[Any] = Future()
+                try:
+                    with self._inline_lock:
+                        future.set_result(fn(*args))
+                except Exception as e:
+                    future.set_exception(e)
+            else:
+                future = self._pool().submit(fn, *args)
+        except BaseException:
+            self._release(None)
+            raise
+
+        def done(f: "Future[Any]") -> None:
+            error = None if f.cancelled() else f.exception()
+            failed = f.cancelled() or error is not None
+            self._release(None if failed else time.perf_counter() - start)
+            if isinstance(error, BrokenProcessPool):
+                self._reset()
+
+        future.add_done_callback(done)
+        return future
+
+    def processa(self, content: bytes, engine: str = ENGINES[0]) -> ExamDocument:
+        """
+        This function parses a PDF document in the pool with the given
+        extraction engine, blocking until it is done, and merges the worker
+        timings into the current trace.
+
+        Raises:
+        QueueFull: When the queue is full.
+        """
+        result: tuple[ExamDocument, dict[str, Any]] = self.submit(
+            processa_no_worker, content, engine
+        ).result()
+        document, worker_trace = result
+        timing.merge(worker_trace)
+        return document
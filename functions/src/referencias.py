@@ -0,0 +1,184 @@
+import re
+from collections.abc import Callable
+from functools import lru_cache
+
+Limites = tuple[str | None, str | None, str | None]
+
+NAO_ENCONTRADO = "Não encontrado pela IA..."
+TRADICIONAL = "Ver resultado tradicional"
+
+INFERIOR_A = re.compile("inferior a ")
+INTERVALO = re.compile(" a ")
+JEJUM = re.compile("jejum")
+MENOR_QUE = re.compile("menor que ", re.IGNORECASE)
+MAIOR_QUE = re.compile("maior que ", re.IGNORECASE)
+MENOR = re.compile("< ")
+MAIOR = re.compile("> ")
+ATE = re.compile("até", re.IGNORECASE)
+# o valor é o que vem depois do marcador, sem a primeira letra ("Menor"/"menor")
+DEPOIS_DE_MENOR_QUE = re.compile("enor que ")
+DEPOIS_DE_MAIOR_QUE = re.compile("aior que ")
+DEPOIS_DE_ATE = re.compile("té ")
+VALOR_E_UNIDADE = re.compile("([^ ]*) ([^ ]*)")  # exatamente um espaço
+VALOR_BARRA_UNIDADE = re.compile("([^/]*)/([^/]*)")
+
+
+def valor_e_unidade(separador: re.Pattern[str], texto: str) -> tuple[str, str]:
+    """
+    This function extracts the value and the unit that follow a marker,
+    such as "menor que " in "Menor que 5,0 mg/L".
+
+    Parameters:
+    separador (re.Pattern[str]): The compiled marker that precedes the value.
+    texto (str): The reference text.
+
+    Returns:
+    tuple[str, str]: The value and the unit.
+
+    Raises:
+    ValueError: When the marker is missing or the text after it is not
+    exactly a value and a unit separated by one space.
+    """
+    partes = separador.split(texto, maxsplit=2)
+    if len(partes) < 2:
+        raise ValueError(f"Marcador {separador.pattern!r} não encontrado")
+    match = VALOR_E_UNIDADE.fullmatch(partes[1])
+    if match is None:
+        raise ValueError(f"Valor e unidade não encontrados em {partes[1]!r}")
+    return match.group(1), match.group(2)
+
+
+def valor_e_unidade_sem_marcador(texto: str) -> tuple[str, str]:
+    match = VALOR_E_UNIDADE.fullmatch(texto)
+    if match is None:
+        raise ValueError(f"Valor e unidade não encontrados em {texto!r}")
+    return match.group(1), match.group(2)
+
+
+def inferior_a(cell: str) -> Limites:
+    inferior, unidade = valor_e_unidade(INFERIOR_A, cell)
+    return inferior, None, unidade
+
+
+def intervalo(cell: str) -> Limites:
+    partes = INTERVALO.split(cell)
+    if len(partes) != 2:
+        raise ValueError("Mais de um intervalo na referência")
+    inferior, superior_e_unidade = partes
+    inferior = inferior.strip()
+    if ":" in inferior:
+        inferior = inferior.split(":")[1]
+    superior, unidade = None, NAO_ENCONTRADO
+    if " " in superior_e_unidade:
+        superior, unidade = valor_e_unidade_sem_marcador(superior_e_unidade)
+        superior = superior.strip()
+    elif match := VALOR_BARRA_UNIDADE.fullmatch(superior_e_unidade):
+        superior, unidade = match.group(1).strip(), "/" + match.group(2)
+    elif "/" in superior_e_unidade:
+        raise ValueError("Mais de uma barra na referência")
+    return inferior, superior, unidade
+
+
+def tradicional(cell: str) -> Limites:
+    return None, None, TRADICIONAL
+
+
+def jejum(cell: str) -> Limites:
+    """
+    Handles the fasting references, either in two lines
+    ("com jejum" / "sem jejum") or in four lines
+    (lower limit, unit, upper limit, note).
+    """
+    linhas = cell.split("\n")
+    if len(linhas) == 2:
+        com_jejum, sem_jejum = linhas
+        # sem jejum dá o limite inferior, com jejum o superior
+        for texto, limite_inferior, marcadores in (
+            (sem_jejum, True, ((MENOR, MENOR), (MENOR_QUE, DEPOIS_DE_MENOR_QUE))),
+            (com_jejum, False, ((MENOR_QUE, DEPOIS_DE_MENOR_QUE), (MENOR, MENOR))),
+            (sem_jejum, True, ((MAIOR, MAIOR), (MAIOR_QUE, DEPOIS_DE_MAIOR_QUE))),
+            (com_jejum, False, ((MAIOR_QUE, DEPOIS_DE_MAIOR_QUE), (MAIOR, MAIOR))),
+        ):
+            separador = next((sep for m, sep in marcadores if m.search(texto)), None)
+            if separador is None:
+                continue
+            valor, unidade = valor_e_unidade(separador, texto)
+            if limite_inferior:
+                return valor, None, unidade
+            return None, valor, unidade
+        return None, None, NAO_ENCONTRADO
+
+    if len(linhas) != 4:
+        raise ValueError("Referência de jejum com número inesperado de linhas")
+    inferior, unidade, superior, _ = linhas
+    for marcador, separador in (
+        (MENOR_QUE, DEPOIS_DE_MENOR_QUE),
+        (MAIOR_QUE, DEPOIS_DE_MAIOR_QUE),
+        (MENOR, MENOR),
+        (MAIOR, MAIOR),
+    ):
+        if marcador.search(inferior) and marcador.search(superior):
+            partes_inferior = separador.split(inferior, maxsplit=2)
+            partes_superior = separador.split(superior, maxsplit=2)
+            if len(partes_inferior) < 2 or len(partes_superior) < 2:
+                raise ValueError(f"Marcador {separador.pattern!r} não encontrado")
+            inferior = partes_inferior[1].strip()
+            superior = partes_superior[1].strip()
+    return inferior, superior, unidade
+
+
+def limite_com_marcador(
+    separador: re.Pattern[str], limite_inferior: bool
+) -> Callable[[str], Limites]:
+    def regra(cell: str) -> Limites:
+        valor, unidade = valor_e_unidade(separador, cell)
+        if limite_inferior:
+            return valor, None, unidade
+        return None, valor, unidade
+
+    return regra
+
+
+# Regras em ordem de prioridade: a primeira cujo padrão aparece na referência vence
+REGRAS: list[tuple[re.Pattern[str], Callable[[str], Limites]]] = [
+    (INFERIOR_A, inferior_a),
+    (INTERVALO, intervalo),
+    (re.compile(TRADICIONAL), tradicional),
+    (JEJUM, jejum),
+    (MENOR_QUE, limite_com_marcador(DEPOIS_DE_MENOR_QUE, limite_inferior=True)),
+    (MAIOR_QUE, limite_com_marcador(DEPOIS_DE_MAIOR_QUE, limite_inferior=False)),
+    (MENOR, limite_com_marcador(MENOR, limite_inferior=True)),
+    (MAIOR, limite_com_marcador(MAIOR, limite_inferior=False)),
+    (ATE, limite_com_marcador(DEPOIS_DE_ATE, limite_inferior=False)),
+]
+
+
+@lru_cache(maxsize=4096)
+def mapeia_valores_referencia(cell: str | None) -> Limites:
+    """
+    This function is used to map and parse reference values from a given cell
+    in a PDF table. It extracts the lower and upper limits,
+    as well as the unit of measurement, from the cell content.
+    The cell is matched against the ordered table of rules REGRAS and the
+    results are memoized, since the same references repeat across every
+    exam date and every patient.
+
+    Parameters:
+    cell (str | None): The cell content from which to extract the reference values.
+
+    Returns:
+    tuple[str | None,...]: A tuple containing the lower limit,
+    upper limit, and unit of measurement.
+    If the cell content does not contain reference values,
+    the tuple will contain None for all values.
+    """
+    if not isinstance(cell, str) or cell == "----":
+        return None, None, None
+    cell = cell.replace("De", "")
+    for padrao, regra in REGRAS:
+        if padrao.search(cell):
+            try:
+                return regra(cell)
+            except ValueError:
+                return None, None, None
+    return None, None, NAO_ENCONTRADO
@@ -0,0 +1,314 @@
+"""
+Read side of the exams: a per-user summary document with the latest
+result of each analyte, kept up to date at ingest time so that the
+dashboard is a single document read, and the paginated history of one
+analyte read from its time series (see src.series).
+"""
+
+import math
+from datetime import date, datetime, timezone
+from typing import Any
+
+from firebase_functions import logger
+
+from src.documents import ExamDocument
+from src.series import (
+    SERIES_COLLECTION,
+    chave_da_observacao,
+    id_do_analito,
+    mescla_series,
+    observacoes_por_analito,
+)
+
+SUMMARY_COLLECTION = "summary"
+SUMMARY_DOCUMENT = "analytes"
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 500
+
+
+def resumo_ref(client: Any, uid: str) -> Any:
+    """Returns the reference of the summary document of a user."""
+    return client.collection(f"users/{uid}/{SUMMARY_COLLECTION}").document(
+        SUMMARY_DOCUMENT
+    )
+
+
+def _vazio(value: Any) -> bool:
+    # None, NaN e NaT
+    return value is None or bool(value != value)
+
+
+def fora_da_faixa(resultado: Any, inferior: Any, superior: Any) -> bool | None:
+    """
+    This function tells whether a result is outside its reference range.
+
+    Returns:
+    bool | None: True when the result is below the lower limit or above the
+    upper one, False when it is within the known limits, and None when there
+    is no numeric result or no limit to compare with.
+    """
+    if not isinstance(resultado, int | float) or _vazio(resultado):
+        return None
+    limites = [x for x in (inferior, superior) if not _vazio(x)]
+    if not limites:
+        return None
+    return bool(
+        (not _vazio(inferior) and resultado < inferior)
+        or (not _vazio(superior) and resultado > superior)
+    )
+
+
+def ordem(observacao: dict[str, Any]) -> tuple[str, str]:
+    """
+    Sort key of an observation, (date, Ficha), comparable between the naive
+    dates of the parser and the timezone-aware ones read from Firestore.
+    """
+    data = observacao.get("Data")
+    dia = "" if data is None or _vazio(data) else data.strftime("%Y-%m-%d")
+    return dia, str(observacao.get("Ficha", ""))
+
+
+def ultimos_por_analito(documents: list[ExamDocument]) -> dict[str, dict[str, Any]]:
+    """
+    This function finds the most recent observation of each analyte across
+    parsed exams, by exam date and then Ficha.
+
+    Parameters:
+    documents (list[ExamDocument]): The column-oriented parsed exams.
+
+    Returns:
+    dict[str, dict[str, Any]]: For each analyte id (see id_do_analito), the
+    summary entry: name, Ficha, Data, result, limits, unit, whether the
+    reference varies with age and out_of_range.
+    """
+    ultimos: dict[str, dict[str, Any]] = {}
+    for document in documents:
+        for nome, observacoes in observacoes_por_analito(document).items():
+            analito = id_do_analito(nome)
+            for observacao in observacoes.values():
+                atual = ultimos.get(analito)
+                if atual is None or ordem(observacao) > ordem(atual):
+                    ultimos[analito] = {"name": nome, **observacao}
+    for entry in ultimos.values():
+        entry["out_of_range"] = fora_da_faixa(
+            entry.get("RESULTADOS"),
+            entry.get("Limite inferior"),
+            entry.get("Limite superior"),
+        )
+    return ultimos
+
+
+def atualiza_resumo(
+    client: Any, uid: str, documents: list[ExamDocument], sobrescreve: bool = False
+) -> int:
+    """
+    This function merges newly ingested exams into the summary document of
+    the user (users/{uid}/summary/analytes). An analyte entry is only
+    replaced by an observation at least as recent as the stored one, so
+    uploading an older report never hides a newer result. The read, the
+    comparison and the write run in a transaction, retried by Firestore when
+    a concurrent ingest changes the summary in between.
+
+    Parameters:
+    client (Any): The Firestore client (or an in-memory stand-in).
+    uid (str): The id of the user that sent the exams.
+    documents (list[ExamDocument]): The column-oriented parsed exams.
+    sobrescreve (bool): Whether the exams are a new parse of stored ones:
+    then an entry that came from one of their observations is replaced
+    even by an older one, since its old values may be wrong.
+
+    Returns:
+    int: The number of analyte entries written.
+    """
+    novos = ultimos_por_analito(documents)
+    if not novos:
+        return 0
+    chaves: dict[str, set[str]] = {}
+    if sobrescreve:
+        for document in documents:
+            for nome, observacoes in observacoes_por_analito(document).items():
+                chaves.setdefault(id_do_analito(nome), set()).update(observacoes)
+
+    def substitui(analito: str, entry: dict[str, Any], salvo: dict[str, Any]) -> bool:
+        chave = chave_da_observacao(salvo.get("Ficha"), salvo.get("Data"))
+        return ordem(entry) >= ordem(salvo) or chave in chaves.get(analito, set())
+
+    # só carregado quando há o que gravar, como o próprio cliente do Firestore
+    from google.cloud.firestore import transactional
+
+    ref = resumo_ref(client, uid)
+
+    @transactional
+    def mescla(transaction: Any) -> int:
+        snapshot = ref.get(transaction=transaction)
+        resumo = (snapshot.to_dict() or {}) if snapshot.exists else {}
+        salvos = resumo.get("analytes", {})
+        alterados = {
+            analito: entry
+            for analito, entry in novos.items()
+            if analito not in salvos or substitui(analito, entry, salvos[analito])
+        }
+        if alterados:
+            transaction.set(
+                ref,
+                {"analytes": alterados, "updated_at": datetime.now(tz=timezone.utc)},
+                merge=True,
+            )
+        return len(alterados)
+
+    escritos: int = mescla(client.transaction())
+    if escritos:
+        logger.info(f"Updated {escritos} analytes in the summary of {uid}")
+    return escritos
+
+
+def atualiza_leitura(
+    client: Any, uid: str, documents: list[ExamDocument], sobrescreve: bool = False
+) -> int:
+    """
+    This function keeps the whole read side up to date after an ingest, on
+    every ingest path: it merges each exam into the analyte time series read
+    by le_historico (see mescla_series) and the latest values into the
+    summary read by le_painel (see atualiza_resumo).
+
+    Parameters:
+    client (Any): The Firestore client (or an in-memory stand-in).
+    uid (str): The id of the user that sent the exams.
+    documents (list[ExamDocument]): The column-oriented parsed exams.
+    sobrescreve (bool): Whether the exams are a new parse of stored ones,
+    whose changed observations replace the stored ones (see mescla_series).
+
+    Returns:
+    int: The number of summary entries written.
+    """
+    for document in documents:
+        mescla_series(client, uid, document, sobrescreve)
+    return atualiza_resumo(client, uid, documents, sobrescreve)
+
+
+def para_json(value: Any) -> Any:
+    """Converts Firestore values to JSON: dates as YYYY-MM-DD, NaN as null."""
+    if isinstance(value, dict):
+        return {k: para_json(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [para_json(v) for v in value]
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, datetime):
+        return None if _vazio(value) else value.strftime("%Y-%m-%d")
+    return value
+
+
+def le_painel(
+    client: Any, uid: str, busca: str | None = None, apenas_alterados: bool = False
+) -> dict[str, Any]:
+    """
+    This function reads the latest-values dashboard of a user: a single read
+    of the summary document.
+
+    Parameters:
+    client (Any): The Firestore client (or an in-memory stand-in).
+    uid (str): The id of the user.
+    busca (str | None): Keeps only the analytes whose name contains it,
+    ignoring case.
+    apenas_alterados (bool): Keeps only the analytes out of range.
+
+    Returns:
+    dict[str, Any]: The analytes sorted by name and the time of the last
+    update, ready to be serialized as JSON.
+    """
+    snapshot = resumo_ref(client, uid).get()
+    resumo = (snapshot.to_dict() or {}) if snapshot.exists else {}
+    analitos = sorted(
+        resumo.get("analytes", {}).values(), key=lambda e: str(e.get("name"))
+    )
+    if busca:
+        analitos = [e for e in analitos if busca.lower() in str(e["name"]).lower()]
+    if apenas_alterados:
+        analitos = [e for e in analitos if e.get("out_of_range")]
+    updated_at = resumo.get("updated_at")
+    return {
+        "analytes": para_json(analitos),
+        "updated_at": updated_at.isoformat() if updated_at else None,
+    }
+
+
+def _dia_iso(texto: str | None) -> str | None:
+    # normaliza para YYYY-MM-DD, comparável com ordem(); None sem filtro
+    if not texto:
+        return None
+    try:
+        return date.fromisoformat(texto).isoformat()
+    except ValueError as e:
+        raise ValueError(f"Invalid date: {texto} (expected YYYY-MM-DD)") from e
+
+
+def le_historico(
+    client: Any,
+    uid: str,
+    nome: str,
+    inicio: str | None = None,
+    fim: str | None = None,
+    limite: int = HISTORY_PAGE_SIZE,
+    cursor: str | None = None,
+) -> dict[str, Any] | None:
+    """
+    This function reads one page of the history of an analyte, newest
+    first, from its time series (users/{uid}/analytes/{analyte}).
+
+    Parameters:
+    client (Any): The Firestore client (or an in-memory stand-in).
+    uid (str): The id of the user.
+    nome (str): The analyte name.
+    inicio (str | None): Keeps only observations from this date on
+    (YYYY-MM-DD).
+    fim (str | None): Keeps only observations up to this date (YYYY-MM-DD).
+    limite (int): The page size, at most HISTORY_MAX_PAGE_SIZE.
+    cursor (str | None): The next_page_token of the previous page.
+
+    Returns:
+    dict[str, Any] | None: The observations of the page, with their
+    out_of_range flags, and the next_page_token (None on the last page), or
+    None when the user has no series for the analyte.
+
+    Raises:
+    ValueError: When inicio or fim is not a valid YYYY-MM-DD date, or the
+    cursor does not belong to the filtered history.
+    """
+    inicio, fim = _dia_iso(inicio), _dia_iso(fim)
+    snapshot = (
+        client.collection(f"users/{uid}/{SERIES_COLLECTION}")
+        .document(id_do_analito(nome))
+        .get()
+    )
+    if not snapshot.exists:
+        return None
+    observacoes = list((snapshot.to_dict() or {}).get("observations", {}).values())
+    observacoes.sort(key=ordem, reverse=True)
+    if inicio:
+        observacoes = [o for o in observacoes if ordem(o)[0] >= inicio]
+    if fim:
+        observacoes = [o for o in observacoes if ordem(o)[0] <= fim]
+    chaves = [chave_da_observacao(o.get("Ficha"), o.get("Data")) for o in observacoes]
+    start = 0
+    if cursor:
+        if cursor not in chaves:
+            raise ValueError(f"Invalid page token: {cursor}")
+        start = chaves.index(cursor) + 1
+    limite = max(1, min(limite, HISTORY_MAX_PAGE_SIZE))
+    pagina = observacoes[start : start + limite]
+    for observacao in pagina:
+        observacao["out_of_range"] = fora_da_faixa(
+            observacao.get("RESULTADOS"),
+            observacao.get("Limite inferior"),
+            observacao.get("Limite superior"),
+        )
+    fim_da_pagina = start + len(pagina)
+    return {
+        "analyte": nome,
+        "total": len(observacoes),
+        "observations": para_json(pagina),
+        "next_page_token": chaves[fim_da_pagina - 1]
+        if fim_da_pagina < len(observacoes)
+        else None,
+    }
@@ -0,0 +1,161 @@
+from datetime import datetime, timezone
+from typing import Any
+from urllib.parse import quote
+
+from firebase_functions import logger
+
+from src.batch import FIRESTORE_BATCH_LIMIT
+from src.documents import ExamDocument
+
+SERIES_COLLECTION = "analytes"
+OBSERVATION_FIELDS = [
+    "RESULTADOS",
+    "Limite inferior",
+    "Limite superior",
+    "Unidade",
+    "VALORES DE REFERÊNCIA",
+    "Referência varia com idade",
+]
+
+
+def id_do_analito(nome: str) -> str:
+    """
+    Returns the document id of an analyte's time series: its name
+    percent-encoded, since Firestore ids cannot contain "/".
+    """
+    return quote(nome, safe=" ") or "_"
+
+
+def chave_da_observacao(ficha: Any, data: Any) -> str:
+    """
+    This function builds the key that identifies an observation inside an
+    analyte's time series, the (Ficha, Data) pair of the exam it comes from.
+    Every evolutive report repeats the earlier dates, so this key is what
+    deduplicates them.
+    """
+    # NaT e NaN são diferentes de si mesmos
+    sem_data = data is None or data != data
+    return f"{ficha}_{'' if sem_data else data.strftime('%Y-%m-%d')}"
+
+
+def observacoes_por_analito(
+    document: ExamDocument,
+) -> dict[str, dict[str, dict[str, Any]]]:
+    """
+    This function regroups a parsed exam, one row per (analyte, exam date),
+    into one time series per analyte.
+
+    Parameters:
+    document (ExamDocument): The column-oriented parsed exam.
+
+    Returns:
+    dict[str, dict[str, dict[str, Any]]]: For each analyte name, its
+    observations keyed by chave_da_observacao. Rows without an analyte
+    name are dropped.
+    """
+    colunas = [c for c in OBSERVATION_FIELDS if c in document]
+    series: dict[str, dict[str, dict[str, Any]]] = {}
+    for i, nome in enumerate(document.get("ANALITOS", [])):
+        if not isinstance(nome, str) or not nome.strip():
+            continue
+        ficha, data = document["Ficha"][i], document["Data"][i]
+        observacao = {"Ficha": ficha, "Data": data}
+        observacao.update((c, document[c][i]) for c in colunas)
+        series.setdefault(nome.strip(), {})[chave_da_observacao(ficha, data)] = (
+            observacao
+        )
+    return series
+
+
+def _vazio(value: Any) -> bool:
+    # None, NaN e NaT
+    return value is None or bool(value != value)
+
+
+def mesma_observacao(salva: dict[str, Any], nova: dict[str, Any]) -> bool:
+    """
+    Tells whether a stored observation has the values of a new one, with
+    missing values, None and NaN all equal. Data is not compared: it is
+    part of the key of both.
+    """
+    for campo in ["Ficha", *OBSERVATION_FIELDS]:
+        a, b = salva.get(campo), nova.get(campo)
+        if not (_vazio(a) and _vazio(b)) and a != b:
+            return False
+    return True
+
+
+def mescla_series(
+    client: Any, uid: str, document: ExamDocument, sobrescreve: bool = False
+) -> dict[str, int]:
+    """
+    This function merges a parsed exam into the user's per-analyte time
+    series (users/{uid}/analytes/{analyte}), writing only the observations
+    whose (Ficha, Data) is not stored yet. Existing series are read in a
+    single get_all round trip and the new observations are written with
+    merged batched writes, so earlier observations are never rewritten,
+    unless sobrescreve is True: then the stored observations whose values
+    differ from the exam are replaced too, as when the exam is reparsed.
+
+    Parameters:
+    client (Any): The Firestore client (or an in-memory stand-in).
+    uid (str): The id of the user that sent the exam.
+    document (ExamDocument): The column-oriented parsed exam.
+    sobrescreve (bool): Whether to replace the changed observations.
+
+    Returns:
+    dict[str, int]: The number of analytes touched and of new, updated and
+    duplicate observations.
+    """
+    series = observacoes_por_analito(document)
+    collection = client.collection("users/" + uid + "/" + SERIES_COLLECTION)
+    refs = {nome: collection.document(id_do_analito(nome)) for nome in series}
+    conhecidas: dict[str, dict[str, dict[str, Any]]] = {}
+    for snapshot in client.get_all(list(refs.values())):
+        if snapshot.exists:
+            observacoes = (snapshot.to_dict() or {}).get("observations", {})
+            conhecidas[snapshot.id] = observacoes
+
+    now = datetime.now(tz=timezone.utc)
+    writes = []
+    novas = atualizadas = duplicadas = 0
+    for nome, observacoes in series.items():
+        ref = refs[nome]
+        ja_salvas = conhecidas.get(ref.id, {})
+        faltantes = {k: v for k, v in observacoes.items() if k not in ja_salvas}
+        alteradas = {}
+        if sobrescreve:
+            # todos os campos, para apagar os que o novo parse não tem mais
+            alteradas = {
+                k: {c: v.get(c) for c in ["Ficha", "Data", *OBSERVATION_FIELDS]}
+                for k, v in observacoes.items()
+                if k in ja_salvas and not mesma_observacao(ja_salvas[k], v)
+            }
+        duplicadas += len(observacoes) - len(faltantes) - len(alteradas)
+        if faltantes or alteradas:
+            novas += len(faltantes)
+            atualizadas += len(alteradas)
+            writes.append(
+                (
+                    ref,
+                    {
+                        "name": nome,
+                        "observations": {**faltantes, **alteradas},
+                        "updated_at": now,
+                    },
+                )
+            )
+
+    for start in range(0, len(writes), FIRESTORE_BATCH_LIMIT):
+        chunk = writes[start : start + FIRESTORE_BATCH_LIMIT]
+        batch = client.batch()
+        for ref, data in chunk:
+            batch.set(ref, data, merge=True)
+        logger.info(f"Merging {len(chunk)} analyte series for user {uid}")
+        batch.commit()
+    return {
+        "analytes": len(writes),
+        "new": novas,
+        "updated": atualizadas,
+        "duplicates": duplicadas,
+    }
@@ -0,0 +1,157 @@
+import cProfile
+import os
+import time
+import tracemalloc
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, TypeVar
+
+from firebase_functions import logger
+
+RT = TypeVar("RT")  # return type
+
+PROFILE_DIR_ENV = "EXAM_PROFILE_DIR"  # quando definida, salva um .prof por request
+
+
+class Trace:
+    """
+    Per-request accumulator of stage durations (milliseconds, summed when a
+    stage repeats, e.g. find_tables once per page) and counters
+    (pages, tables, rows, bytes). While tracemalloc is tracing, the peak
+    allocation of each stage above its starting point is kept as well
+    (KiB, the largest when a stage repeats).
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.stages_ms: dict[str, float] = {}
+        self.counts: dict[str, int] = {}
+        self.peak_kib: dict[str, float] = {}
+        self._start = time.perf_counter()
+        # picos absolutos dos estágios abertos, para não perder o pico de um
+        # estágio externo quando um interno chama tracemalloc.reset_peak()
+        self._open_peaks: list[int] = []
+
+    def add(self, stage: str, ms: float) -> None:
+        self.stages_ms[stage] = self.stages_ms.get(stage, 0.0) + ms
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def peak(self, stage: str, kib: float) -> None:
+        self.peak_kib[stage] = max(self.peak_kib.get(stage, 0.0), kib)
+
+    def export(self) -> dict[str, dict[str, Any]]:
+        return {
+            "stages_ms": dict(self.stages_ms),
+            "counts": dict(self.counts),
+            "peak_kib": dict(self.peak_kib),
+        }
+
+    def merge(self, exported: dict[str, dict[str, Any]]) -> None:
+        """Adds the stages and counters exported by another process."""
+        for stage, ms in exported["stages_ms"].items():
+            self.add(stage, ms)
+        for name, n in exported["counts"].items():
+            self.count(name, n)
+        for stage, kib in exported.get("peak_kib", {}).items():
+            self.peak(stage, kib)
+
+    def emit(self) -> None:
+        total_ms = (time.perf_counter() - self._start) * 1000
+        logger.info(
+            f"Timings for {self.name}",
+            trace=self.name,
+            total_ms=round(total_ms, 2),
+            stages_ms={k: round(v, 2) for k, v in self.stages_ms.items()},
+            counts=self.counts,
+        )
+
+
+current_trace: ContextVar[Trace | None] = ContextVar("current_trace", default=None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Times the block as a stage of the current trace, if there is one."""
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    memory = _memory_stage(trace, name) if tracemalloc.is_tracing() else nullcontext()
+    with memory:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            trace.add(name, (time.perf_counter() - start) * 1000)
+
+
+@contextmanager
+def _memory_stage(trace: Trace, name: str) -> Iterator[None]:
+    current, outer_peak = tracemalloc.get_traced_memory()
+    if trace._open_peaks:
+        trace._open_peaks[-1] = max(trace._open_peaks[-1], outer_peak)
+    tracemalloc.reset_peak()
+    trace._open_peaks.append(current)
+    try:
+        yield
+    finally:
+        peak = max(trace._open_peaks.pop(), tracemalloc.get_traced_memory()[1])
+        trace.peak(name, (peak - current) / 1024)
+        if trace._open_peaks:
+            trace._open_peaks[-1] = max(trace._open_peaks[-1], peak)
+
+
+def count(name: str, n: int = 1) -> None:
+    """Increments a counter of the current trace, if there is one."""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.count(name, n)
+
+
+def merge(exported: dict[str, dict[str, Any]]) -> None:
+    """Adds a trace exported by a worker process to the current trace."""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.merge(exported)
+
+
+@contextmanager
+def tracing(name: str, emit: bool = True) -> Iterator[Trace]:
+    """
+    Starts a trace for the block and, when emit is True, writes its single
+    structured log record at the end. If EXAM_PROFILE_DIR is set, the block
+    also runs under cProfile and the stats are dumped to that directory.
+    """
+    trace = Trace(name)
+    token = current_trace.set(trace)
+    profile_dir = os.environ.get(PROFILE_DIR_ENV)
+    profiler = cProfile.Profile() if profile_dir else None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield trace
+    finally:
+        current_trace.reset(token)
+        if profiler is not None and profile_dir:
+            profiler.disable()
+            os.makedirs(profile_dir, exist_ok=True)
+            path = os.path.join(profile_dir, f"{name}-{time.time_ns()}.prof")
+            profiler.dump_stats(path)
+            logger.info(f"Profile saved to {path}")
+        if emit:
+            trace.emit()
+
+
+def traced(fn: Callable[..., RT]) -> Callable[..., RT]:
+    """Runs each call of fn inside its own trace named after fn."""
+
+    @wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> RT:
+        with tracing(fn.__name__):
+            return fn(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,128 @@
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from hashlib import sha256
+from threading import Lock
+from typing import Any
+
+
+class TokenUser:
+    """
+    Minimal user built from the claims of a verified ID token, passed to the
+    handlers that opt out of the UserRecord lookup.
+    """
+
+    def __init__(self, claims: dict[str, Any]) -> None:
+        self.uid: str = claims["uid"]
+        self.email: str | None = claims.get("email")
+        self.claims = claims
+
+
+class TTLCache:
+    """LRU cache whose entries expire at their own deadline."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.miss_seconds = 0.0  # tempo gasto nas chamadas que o cache evitaria
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, float]:
+        total = self.hits + self.misses
+        average_miss = self.miss_seconds / self.misses if self.misses else 0.0
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "saved_ms": round(self.hits * average_miss * 1000, 1),
+        }
+
+
+class TokenVerifier:
+    """
+    Verifies Firebase ID tokens and looks up users, caching both.
+    Decoded tokens are kept until they expire (never longer than
+    max_token_ttl); UserRecords are kept for user_ttl seconds. The Firebase
+    Auth calls can be replaced, e.g. by a fake verifier for local runs.
+    """
+
+    def __init__(
+        self,
+        max_token_ttl: float = 3600,
+        user_ttl: float = 300,
+        max_entries: int = 1024,
+        verify_id_token: Callable[[str], dict[str, Any]] | None = None,
+        get_user: Callable[[str], Any] | None = None,
+    ) -> None:
+        self.max_token_ttl = max_token_ttl
+        self.user_ttl = user_ttl
+        self.tokens = TTLCache(max_entries)
+        self.users = TTLCache(max_entries)
+        self._verify_id_token = verify_id_token
+        self._get_user = get_user
+
+    def verify(self, token: str) -> dict[str, Any]:
+        """
+        This function returns the decoded claims of an ID token, verifying
+        it with Firebase Auth only when it is not cached.
+
+        Raises:
+        Exception: Whatever auth.verify_id_token raises for invalid tokens.
+        """
+        key = sha256(token.encode()).hexdigest()  # não guarda o token em si
+        claims: dict[str, Any] | None = self.tokens.get(key)
+        if claims is not None:
+            return claims
+        start = time.perf_counter()
+        if self._verify_id_token is not None:
+            claims = self._verify_id_token(token)
+        else:
+            from firebase_admin import auth  # carregado só no primeiro cache miss
+
+            claims = auth.verify_id_token(token)
+        self.tokens.miss_seconds += time.perf_counter() - start
+        ttl = min(float(claims.get("exp", 0)) - time.time(), self.max_token_ttl)
+        self.tokens.set(key, claims, ttl)
+        return claims
+
+    def get_user(self, uid: str) -> Any:
+        """This function returns the UserRecord of uid, cached for user_ttl."""
+        user = self.users.get(uid)
+        if user is not None:
+            return user
+        start = time.perf_counter()
+        if self._get_user is not None:
+            user = self._get_user(uid)
+        else:
+            from firebase_admin import auth
+
+            user = auth.get_user(uid)
+        self.users.miss_seconds += time.perf_counter() - start
+        self.users.set(uid, user, self.user_ttl)
+        return user
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        return {"tokens": self.tokens.stats(), "users": self.users.stats()}
@@ -0,0 +1,44 @@
+from hashlib import sha256
+from typing import BinaryIO
+
+CHUNK_BYTES = 64 * 1024
+
+
+class PayloadTooLarge(ValueError):
+    """Raised when more than the allowed bytes are read from a request body."""
+
+
+def le_corpo(
+    stream: BinaryIO, limite: int, chunk_bytes: int = CHUNK_BYTES
+) -> tuple[bytes, str]:
+    """
+    This function reads a request body in chunks, computing its SHA-256
+    digest while reading. The limit is enforced on the bytes actually read,
+    so a missing or wrong Content-Length header cannot bypass it, and
+    reading stops as soon as it is exceeded.
+
+    The chunks are joined once into a single bytes object, the only type
+    PyMuPDF opens without copying (bytearray is copied, memoryview rejected).
+
+    Parameters:
+    stream (BinaryIO): The body stream, e.g. req.stream.
+    limite (int): The maximum number of bytes accepted.
+    chunk_bytes (int): The size of each read.
+
+    Returns:
+    tuple[bytes, str]: The body and its SHA-256 hex digest.
+
+    Raises:
+    PayloadTooLarge: When the body has more than limite bytes.
+    """
+    digest = sha256()
+    chunks: list[bytes] = []
+    total = 0
+    while chunk := stream.read(chunk_bytes):
+        total += len(chunk)
+        if total > limite:
+            raise PayloadTooLarge(f"Body larger than {limite} bytes")
+        digest.update(chunk)
+        chunks.append(chunk)
+    content = chunks[0] if len(chunks) == 1 else b"".join(chunks)
+    return content, digest.hexdigest()
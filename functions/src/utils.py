@@ -1,8 +1,47 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from os import cpu_count
+from threading import Lock
+from typing import Any
+
 from firebase_functions import logger
-from pandas import DataFrame, Series, concat, isna, to_datetime, to_numeric
-from pymupdf import Page, open
+from pandas import (
+    DataFrame,
+    Series,
+    concat,
+    factorize,
+    isna,
+    to_datetime,
+    to_numeric,
+)
+from pymupdf import Document, Page, Rect, open
 from pymupdf.table import TableFinder
 
+from src import timing
+from src.documents import ENGINES, ExamDocument
+from src.palavras import DATE_PATTERN, extrai_tabelas_por_palavras
+from src.referencias import mapeia_valores_referencia
+
+# abaixo disso o custo do pool supera o ganho. Com ~0,2 s por página (6 datas,
+# 30 linhas), um pool novo custa ~2 s por laudo e o pool aquecido menos de
+# 0,2 s (benchmarks.parallel_extraction), o que 4 páginas em 2 CPUs já pagam
+PARALLEL_MIN_PAGES = 4
+# Pré-triagem: só chama find_tables nas páginas com cabeçalho de tabela de
+# exames ou com datas e bordas de tabela (continuações);
+# EXAM_PRESCREEN_PAGES=0 desliga. Com
+# EXAM_CLIP_TO_HEADER=1 a busca também fica restrita à região abaixo do
+# primeiro cabeçalho.
+PRESCREEN_PAGES = os.environ.get("EXAM_PRESCREEN_PAGES", "1") != "0"
+CLIP_TO_HEADER = os.environ.get("EXAM_CLIP_TO_HEADER", "0") == "1"
+HEADER_KEYWORDS = ["ANALITOS", "RESULTADOS"]
+HEADER_MARGIN = 20  # pontos acima do cabeçalho mantidos no recorte
+# bordas desenhadas (linhas, ou 4 por retângulo) para uma página só com datas
+# ser candidata: uma grade de 3x3 células, mais que a moldura de uma capa
+MIN_TABLE_EDGES = 8
+BRAZILIAN_DECIMAL = str.maketrans({".": None, ",": "."})  # 1.234,5 -> 1234.5
+
 
 def trata_colunas_iniciais(df: DataFrame, num_col: int) -> DataFrame:
     """
@@ -37,12 +76,13 @@ def trata_colunas_iniciais(df: DataFrame, num_col: int) -> DataFrame:
 
     columns = list(df.iloc[0])  # pega a primeira linha como cabeçalho
     df = df[1:]  # remove a primeira linha
-    to_delete = []
-    start = False
     if df.empty:
         return DataFrame()
     logger.info("Separando ficha e data")
-    for index, _ in enumerate(df.columns):
+    pieces = []  # uma parte por data extra, concatenadas de uma só vez no final
+    to_delete = []
+    start = False
+    for index, column in enumerate(df.columns):
         if not isna(columns[index]) and "\n" in columns[index]:
             ficha, data = columns[index].split("\n")
             if not start:
@@ -50,26 +90,25 @@ def trata_colunas_iniciais(df: DataFrame, num_col: int) -> DataFrame:
                 df["Data"] = to_datetime(data, format="%d/%m/%Y")
                 start = True
             else:
-                logger.info("Concatenando df")
-                df = concat(
-                    [
-                        df,
-                        DataFrame(
-                            {
-                                "Ficha": ficha,
-                                "Data": to_datetime(data, format="%d/%m/%Y"),
-                                "ANALITOS": df["ANALITOS"],
-                                "RESULTADOS": df[df.columns[index]],
-                                "VALORES DE REFERÊNCIA": df["VALORES DE REFERÊNCIA"],
-                            }
-                        ),
-                    ],
-                    axis=0,
+                pieces.append(
+                    DataFrame(
+                        {
+                            "Ficha": ficha,
+                            "Data": to_datetime(data, format="%d/%m/%Y"),
+                            "ANALITOS": df["ANALITOS"],
+                            "RESULTADOS": df[column],
+                            "VALORES DE REFERÊNCIA": df["VALORES DE REFERÊNCIA"],
+                        }
+                    )
                 )
-            if df.columns[index] != "RESULTADOS":
-                to_delete.append(df.columns[index])
+            if column != "RESULTADOS":
+                to_delete.append(column)
     logger.info(f"Dropando colunas {to_delete}")
-    df.drop(columns=to_delete, inplace=True)
+    # remove as colunas de data antes de concatenar, para não replicá-las
+    df = df.drop(columns=to_delete)
+    if pieces:
+        logger.info(f"Concatenando {len(pieces) + 1} datas")
+        df = concat([df, *pieces], axis=0)
     logger.info("Dropando linhas com valores nulos")
     df.dropna(inplace=True, subset=["ANALITOS", "RESULTADOS", "VALORES DE REFERÊNCIA"])
     logger.info("Ordenando pela data e ficha")
@@ -115,148 +154,39 @@ def eliminate_junk_and_rename_cols(tab: TableFinder) -> DataFrame:
     return df
 
 
-def parse_number_cols(cell: Series) -> Series:
-    """
-    This function is used to parse and clean numeric data in a pandas Series.
-    It replaces specific characters, converts the data to numeric format,
-    and adds a new column indicating if a reference varies with age.
-
-    Parameters:
-    cell (Series): A pandas Series containing the data to be parsed.
-
-    Returns:
-    Series: The cleaned and parsed pandas
-    Series with an additional column indicating if a reference varies with age.
-    """
-    found = False
-    for c in cell.index:
-        if not isna(cell[c]):
-            if "(1)" in cell[c]:
-                cell[c] = cell[c].replace("(1)", "")
-            if "(*)" in cell[c]:
-                cell[c] = cell[c].replace("(*)", "")
-                found = True
-            if "----" in cell[c]:
-                cell[c] = cell[c].replace("----", "")
-            try:
-                cell[c] = to_numeric(cell[c].replace(".", "").replace(",", "."))
-            except ValueError:
-                cell[c] = None
-    cell["Referência varia com idade"] = found
-    return cell
-
-
-def mapeia_valores_referencia(cell: str | None) -> tuple[str | None, ...]:
+def parse_number_cols(cells: DataFrame) -> DataFrame:
     """
-    This function is used to map and parse reference values from a given cell
-    in a PDF table. It extracts the lower and upper limits,
-    as well as the unit of measurement, from the cell content.
+    This function is used to parse and clean numeric data in the result columns
+    of a DataFrame, one whole column at a time.
+    It removes the "(1)", "(*)" and "----" markers, converts the Brazilian
+    decimal format to numeric, and adds a new column indicating if a reference
+    varies with age (a "(*)" marker in any of the columns of the row).
+    Cells that can not be converted become None.
 
     Parameters:
-    cell (str | None): The cell content from which to extract the reference values.
+    cells (DataFrame): A pandas DataFrame with the result columns to be parsed.
 
     Returns:
-    tuple[str | None,...]: A tuple containing the lower limit,
-    upper limit, and unit of measurement.
-    If the cell content does not contain reference values,
-    the tuple will contain None for all values.
+    DataFrame: The cleaned and parsed pandas DataFrame with an additional
+    column indicating if a reference varies with age.
     """
-    try:
-        superior, inferior, unidade = None, None, "Não encontrado pela IA..."
-        if not isinstance(cell, str):
-            return None, None, None
-        if cell == "----":
-            return None, None, None
-        cell = cell.replace("De", "")
-        if "inferior a " in cell:
-            inferior_e_unidade = cell.split("inferior a ")[1]
-            inferior, unidade = inferior_e_unidade.split(" ")
-        elif " a " in cell:
-            inferior, superior_e_unidade = cell.split(" a ")
-            inferior = inferior.strip()
-            if ":" in inferior.lower():
-                inferior = inferior.split(":")[1]
-            if " " in superior_e_unidade:
-                superior, unidade = superior_e_unidade.split(" ")
-                superior = superior.strip()
-            elif "/" in superior_e_unidade:
-                superior, unidade = superior_e_unidade.split("/")
-                unidade = "/" + unidade
-                superior = superior.strip()
-        elif "Ver resultado tradicional" in cell:
-            inferior, superior, unidade = None, None, "Ver resultado tradicional"
-        elif "jejum" in cell:
-            tupla_jejum = cell.split("\n")
-            if len(tupla_jejum) == 2:
-                com_jejum, sem_jejum = tupla_jejum
-                if "menor que " in sem_jejum.lower() or "< " in sem_jejum:
-                    if "< " in sem_jejum:
-                        inferior_e_unidade = sem_jejum.split("< ")[1]
-                        inferior, unidade = inferior_e_unidade.split(" ")
-                    else:
-                        inferior_e_unidade = sem_jejum.split("enor que ")[1]
-                        inferior, unidade = inferior_e_unidade.split(" ")
-                elif "menor que " in com_jejum.lower() or "< " in com_jejum:
-                    if "< " in sem_jejum:
-                        inferior_e_unidade = sem_jejum.split("< ")[1]
-                        inferior, unidade = inferior_e_unidade.split(" ")
-                    else:
-                        superior_e_unidade = com_jejum.split("enor que ")[1]
-                        superior, unidade = superior_e_unidade.split(" ")
-                elif "maior que " in sem_jejum.lower() or "> " in sem_jejum:
-                    if "> " in sem_jejum:
-                        inferior_e_unidade = sem_jejum.split("> ")[1]
-                        inferior, unidade = inferior_e_unidade.split(" ")
-                    else:
-                        inferior_e_unidade = sem_jejum.split("aior que ")[1]
-                        inferior, unidade = inferior_e_unidade.split(" ")
-                elif "maior que " in com_jejum.lower() or "> " in com_jejum:
-                    if "> " in sem_jejum:
-                        inferior_e_unidade = sem_jejum.split("> ")[1]
-                        inferior, unidade = inferior_e_unidade.split(" ")
-                    else:
-                        superior_e_unidade = com_jejum.split("aior que ")[1]
-                        superior, unidade = superior_e_unidade.split(" ")
-            else:
-                inferior, unidade, superior, _ = tupla_jejum
-                if (
-                    "menor que " in inferior.lower()
-                    and "menor que " in superior.lower()
-                ):
-                    inferior = inferior.split("enor que ")[1].strip()
-                    superior = superior.split("enor que ")[1].strip()
-                if (
-                    "maior que " in inferior.lower()
-                    and "maior que " in superior.lower()
-                ):
-                    inferior = inferior.split("enor que ")[1].strip()
-                    superior = superior.split("enor que ")[1].strip()
-                if "< " in inferior.lower() and "< " in superior.lower():
-                    inferior = inferior.split("< ")[1].strip()
-                    superior = superior.split("< ")[1].strip()
-                if "> " in inferior.lower() and "> " in superior.lower():
-                    inferior = inferior.split("> ")[1].strip()
-                    superior = superior.split("> ")[1].strip()
-        elif "menor que " in cell.lower():
-            inferior_e_unidade = cell.split("enor que ")[1]
-            inferior, unidade = inferior_e_unidade.split(" ")
-        elif "maior que " in cell.lower():
-            superior_e_unidade = cell.split("aior que ")[1]
-            superior, unidade = superior_e_unidade.split(" ")
-        elif "< " in cell:
-            inferior_e_unidade = cell.split("< ")[1]
-            inferior, unidade = inferior_e_unidade.split(" ")
-        elif "> " in cell:
-            superior_e_unidade = cell.split("> ")[1]
-            superior, unidade = superior_e_unidade.split(" ")
-        elif "até" in cell.lower():
-            superior_e_unidade = cell.split("té ")[1]
-            superior, unidade = superior_e_unidade.split(" ")
+    parsed = DataFrame(index=cells.index)
+    found = Series(False, index=cells.index)
+    for c in cells.columns:
+        text = cells[c].str.replace("(1)", "", regex=False)
+        found |= text.str.contains("(*)", regex=False, na=False)
+        text = text.str.replace("(*)", "", regex=False)
+        text = text.str.replace("----", "", regex=False)
+        text = text.str.translate(BRAZILIAN_DECIMAL)
+        numbers = to_numeric(text, errors="coerce")
+        # "" vira NaN, mas um texto que não é número vira None
+        invalid = numbers.isna() & text.ne("") & text.notna()
+        if (invalid | cells[c].isna()).all() and not numbers.empty:
+            parsed[c] = Series([None] * len(cells), index=cells.index, dtype=object)
         else:
-            inferior, superior, unidade = None, None, unidade
-    except ValueError:
-        inferior, superior, unidade = None, None, None
-    return inferior, superior, unidade
+            parsed[c] = numbers.mask(invalid)
+    parsed["Referência varia com idade"] = found
+    return parsed
 
 
 def parseia_referencia(df: DataFrame, referencia_cols: list[str]) -> DataFrame:
@@ -271,13 +201,20 @@ def parseia_referencia(df: DataFrame, referencia_cols: list[str]) -> DataFrame:
             "A IA não detectou nenhuma coluna com valor de referência"
             "Favor inserir o nome da coluna"
         )
-    df[["Limite inferior", "Limite superior", "Unidade"]] = DataFrame(
-        df[referencia_cols[0]].map(mapeia_valores_referencia).tolist(), index=df.index
+    # as referências se repetem a cada data, então o parser roda só nos
+    # valores únicos e o resultado é replicado para as linhas
+    codes, referencias = factorize(df[referencia_cols[0]], use_na_sentinel=False)
+    limites = DataFrame(
+        [mapeia_valores_referencia(r) for r in referencias],
+        columns=["Limite inferior", "Limite superior", "Unidade"],
     )
     for col in ["Limite inferior", "Limite superior"]:
-        df[col] = to_numeric(
-            df[col].str.replace(".", "").str.replace(",", "."), errors="coerce"
+        limites[col] = to_numeric(
+            limites[col].str.replace(".", "").str.replace(",", "."), errors="coerce"
         )
+    limites = limites.take(codes)
+    limites.index = df.index
+    df[limites.columns] = limites
     return df
 
 
@@ -297,8 +234,8 @@ def trata_e_extrai_limites(df: DataFrame) -> DataFrame:
     The function performs the following steps:
     1. Identifies the relevant columns containing data related
     to the examination results.
-    2. Applies the parse_number_cols function to each relevant column,
-    cleaning and parsing the data.
+    2. Applies the parse_number_cols function to the relevant columns,
+    cleaning and parsing the data column by column.
     3. Identifies the column containing reference values.
     4. Calls the parseia_referencia function to extract the
     lower and upper limits, as well as the unit of measurement,
@@ -313,60 +250,318 @@ def trata_e_extrai_limites(df: DataFrame) -> DataFrame:
             "A IA não detectou nenhuma coluna com valores de resultados"
             "Favor inserir o nome da coluna"
         )
-    tratamento = df[data_cols].apply(parse_number_cols, axis=1)
-    df[tratamento.columns] = tratamento
+    with timing.stage("parse_number_cols"):
+        tratamento = parse_number_cols(df[data_cols])
+        df[tratamento.columns] = tratamento
     referencia_cols = [c for c in df.columns if "valores de referência" in c.lower()]
     logger.info("Parseando valores de referência")
-    return parseia_referencia(df, referencia_cols)
+    with timing.stage("parseia_referencia"):
+        return parseia_referencia(df, referencia_cols)
+
+
+def conta_bordas(page: Page) -> int:
+    """
+    Counts the straight edges drawn on a page: one per line and four per
+    rectangle or quad. Curves (logos, signatures) are not counted.
+    """
+    arestas = {"l": 1, "re": 4, "qu": 4}
+    return sum(
+        arestas.get(item[0], 0)
+        for drawing in page.get_drawings()
+        for item in drawing["items"]
+    )
+
+
+def localiza_cabecalho(page: Page) -> Rect | None:
+    """
+    This function is the pre-screen of a page: a keyword search for the
+    header of the exam tables, much cheaper than find_tables. A table that
+    goes on from the previous page may have only the Ficha/Data cells in its
+    header row (see trata_colunas_iniciais), so a page without the keywords
+    is still a candidate when it has a dd/mm/yyyy date and at least
+    MIN_TABLE_EDGES drawn table edges, the lines find_tables builds its
+    cells from. Cover pages, signature pages and free-text addenda often
+    have dates (birth date, release date) but no table grid.
 
+    Parameters:
+    page (Page): The page to screen.
 
-def get_initial_data(content: bytes) -> DataFrame:
+    Returns:
+    Rect | None: The region from just above the first header down to the
+    bottom of the page, the whole page when it has only dates, or None when
+    the page has no exam table.
+    """
+    textpage = page.get_textpage()
+    tops = [
+        rect.y0
+        for keyword in HEADER_KEYWORDS
+        for rect in page.search_for(keyword, textpage=textpage)
+    ]
+    area = page.rect
+    if not tops:
+        texto = page.get_text("text", textpage=textpage)
+        if not DATE_PATTERN.search(texto):
+            return None
+        return area if conta_bordas(page) >= MIN_TABLE_EDGES else None
+    return Rect(area.x0, max(area.y0, min(tops) - HEADER_MARGIN), area.x1, area.y1)
+
+
+def extrai_tabelas_das_palavras(page: Page) -> list[DataFrame] | None:
+    """
+    This function extracts and cleans the tables of a page with the word
+    coordinates engine (see src.palavras).
+
+    Parameters:
+    page (Page): The page to process.
+
+    Returns:
+    list[DataFrame] | None: The cleaned tables, an empty list for a page
+    without exam table header, or None when find_tables must be used.
+    """
+    with timing.stage("extract_words"):
+        tabelas = extrai_tabelas_por_palavras(page)
+    if tabelas is None:
+        return None
+    frames = []
+    for df in tabelas:
+        timing.count("tables")
+        with timing.stage("trata_colunas_iniciais"):
+            # sem colunas inúteis: só as colunas ancoradas no cabeçalho
+            frames.append(trata_colunas_iniciais(df, 1))
+    return frames
+
+
+def extrai_tabelas_das_paginas(
+    doc: Document, pages: range, engine: str = ENGINES[0]
+) -> list[DataFrame]:
+    """
+    This function finds and cleans the tables of a range of pages
+    of an already opened PDF document.
+
+    Parameters:
+    doc (Document): The opened PDF document.
+    pages (range): The zero-based indexes of the pages to process.
+    engine (str): "tables" to use find_tables, or "words" to use the word
+    coordinates, falling back to find_tables on the pages whose layout it
+    does not recognize.
+
+    Returns:
+    list[DataFrame]: The cleaned tables, in page order.
+    """
+    frames = []
+    for index in pages:  # iterate the document pages
+        page = doc[index]
+        logger.info(f"Processing page {index + 1}")
+        timing.count("pages")
+        if isinstance(page, Page):
+            if engine == "words":
+                tabelas = extrai_tabelas_das_palavras(page)
+                if tabelas == [] and PRESCREEN_PAGES:
+                    logger.info(f"Skipping page {index + 1}: no exam table header")
+                    timing.count("pages_skipped")
+                    continue
+                if tabelas:
+                    frames.extend(tabelas)
+                    continue
+                logger.info(f"Falling back to find_tables on page {index + 1}")
+                timing.count("pages_fallback")
+            area = None
+            if PRESCREEN_PAGES:
+                with timing.stage("prescreen"):
+                    area = localiza_cabecalho(page)
+                if area is None:
+                    logger.info(f"Skipping page {index + 1}: no exam table header")
+                    timing.count("pages_skipped")
+                    continue
+            logger.info("Finding tables")
+            with timing.stage("find_tables"):
+                # find tables in the page
+                tabs = page.find_tables(clip=area if CLIP_TO_HEADER else None)
+
+            for tab in tabs:
+                logger.info("Cleaning and renaming columns")
+                timing.count("tables")
+                with timing.stage("eliminate_junk_and_rename_cols"):
+                    frames.append(eliminate_junk_and_rename_cols(tab))
+    return frames
+
+
+def extrai_tabelas_do_conteudo(
+    content: bytes, pages: range, engine: str = ENGINES[0]
+) -> tuple[list[DataFrame], dict[str, dict[str, Any]]]:
+    """
+    This function is the entry point of the extraction workers.
+    Each worker opens its own copy of the document from the same bytes
+    and processes only its slice of pages.
+
+    Parameters:
+    content (bytes): The content of the PDF document as bytes.
+    pages (range): The zero-based indexes of the pages to process.
+    engine (str): The extraction engine, see extrai_tabelas_das_paginas.
+
+    Returns:
+    tuple[list[DataFrame], dict[str, dict[str, Any]]]: The cleaned tables of
+    the slice, in page order, and the stage timings of the worker, to be
+    merged into the trace of the request.
+    """
+    with timing.tracing("extraction_worker", emit=False) as trace:
+        with timing.stage("pdf_open"):
+            doc = open(stream=content)
+        with doc:
+            frames = extrai_tabelas_das_paginas(doc, pages, engine)
+    return frames, trace.export()
+
+
+def divide_paginas(page_count: int, workers: int) -> list[range]:
+    """
+    This function splits the pages of a document into contiguous slices,
+    one per worker, so that the results can be merged back in page order.
+
+    Parameters:
+    page_count (int): The number of pages of the document.
+    workers (int): The number of slices to create.
+
+    Returns:
+    list[range]: The contiguous page slices, in page order.
+    """
+    size = -(-page_count // workers)  # divisão arredondada para cima
+    return [
+        range(start, min(start + size, page_count))
+        for start in range(0, page_count, size)
+    ]
+
+
+_page_pools: dict[int, ProcessPoolExecutor] = {}
+_page_pools_lock = Lock()
+
+
+def _aquece_paginas() -> None:
+    # importa pandas e pymupdf ao subir o processo, não na primeira fatia
+    import src.utils  # noqa: F401
+
+
+def pool_de_paginas(workers: int) -> ProcessPoolExecutor:
+    """
+    Returns the warm page pool of this process with the given number of
+    workers, started by its first document and reused by the next ones:
+    each spawned worker takes about 0.65 s to import pandas and pymupdf,
+    more than it saves on a short document.
+    """
+    with _page_pools_lock:
+        if workers not in _page_pools:
+            logger.info(f"Starting page pool with {workers} workers")
+            # spawn, como o ParserPool: fork não é seguro num processo com threads
+            _page_pools[workers] = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=get_context("spawn"),
+                initializer=_aquece_paginas,
+            )
+        return _page_pools[workers]
+
+
+def _descarta_pool_de_paginas(workers: int) -> None:
+    with _page_pools_lock:
+        pool = _page_pools.pop(workers, None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def extrai_tabelas_em_paralelo(
+    content: bytes, page_count: int, workers: int, engine: str = ENGINES[0]
+) -> list[DataFrame]:
+    """
+    This function extracts the cleaned tables of a PDF document in the
+    warm page pool of the process (see pool_de_paginas). Each worker
+    handles a contiguous slice of pages and the results are merged back in
+    page order.
+
+    Parameters:
+    content (bytes): The content of the PDF document as bytes.
+    page_count (int): The number of pages of the document.
+    workers (int): The maximum number of worker processes.
+    engine (str): The extraction engine, see extrai_tabelas_das_paginas.
+
+    Returns:
+    list[DataFrame]: The cleaned tables of the whole document, in page order.
+    """
+    logger.info(f"Processing {page_count} pages with {workers} workers")
+    slices = divide_paginas(page_count, workers)
+    frames = []
+    pool = pool_de_paginas(workers)
+    try:
+        for slice_frames, slice_trace in pool.map(
+            extrai_tabelas_do_conteudo,
+            [content] * len(slices),
+            slices,
+            [engine] * len(slices),
+        ):
+            frames.extend(slice_frames)
+            timing.merge(slice_trace)
+    except BrokenProcessPool:
+        _descarta_pool_de_paginas(workers)  # um worker morreu, e.g. por memória
+        raise
+    return frames
+
+
+def get_initial_data(
+    content: bytes, max_workers: int = 1, engine: str = ENGINES[0]
+) -> DataFrame:
     """
     This function extracts initial data from a PDF document
     containing examination results.
 
     Parameters:
     content (bytes): The content of the PDF document as bytes.
+    max_workers (int): The maximum number of processes used to extract the
+    pages in parallel. With 1 (the default), or when the document has fewer
+    than PARALLEL_MIN_PAGES pages, the pages are processed serially.
+    engine (str): The extraction engine, "tables" (the default) or "words".
+    See extrai_tabelas_das_paginas.
 
     Returns:
     DataFrame: A pandas DataFrame containing the extracted data.
 
     The function performs the following steps:
     1. Opens the PDF document using the pymupdf library.
-    2. Iterates through each page of the document.
+    2. Iterates through each page of the document, serially or split in
+    contiguous slices across a process pool.
     3. Finds tables in each page using the pymupdf library.
     4. Calls the eliminate_junk_and_rename_cols function to clean
     and prepare each table.
-    5. Appends the cleaned and prepared table to a final DataFrame.
+    5. Concatenates the cleaned and prepared tables, in page order,
+    into a final DataFrame in a single step.
     6. Returns the final DataFrame containing the extracted data.
     """
-    df = DataFrame()
     logger.info("Opening document")
-    doc = open(stream=content)  # open a document
-    for index, page in enumerate(doc):  # iterate the document pages
-        logger.info(f"Processing page {index + 1}")
-        if isinstance(page, Page):
-            logger.info("Finding tables")
-            tabs = page.find_tables()  # find tables in the page
+    with timing.stage("pdf_open"):
+        doc = open(stream=content)  # open a document
+    with doc:
+        page_count = doc.page_count
+        # o pool tem sempre o mesmo tamanho, para ser reaproveitado
+        workers = min(max_workers, cpu_count() or 1)
+        if workers <= 1 or page_count < PARALLEL_MIN_PAGES:
+            frames = extrai_tabelas_das_paginas(doc, range(page_count), engine)
+        else:
+            frames = extrai_tabelas_em_paralelo(content, page_count, workers, engine)
 
-            for tab in tabs:
-                logger.info("Concatenating, leaning and renaming columns")
-                df = concat(
-                    [
-                        df,
-                        eliminate_junk_and_rename_cols(tab),
-                    ]
-                )  # append to the final DataFrame
-    return df
+    if not frames:
+        return DataFrame()
+    logger.info(f"Concatenating {len(frames)} tables")
+    return concat(frames)  # junta todas as tabelas de uma só vez
 
 
-def get_df_from_pdf_exam(content: bytes) -> DataFrame:
+def get_df_from_pdf_exam(
+    content: bytes, max_workers: int = 1, engine: str = ENGINES[0]
+) -> DataFrame:
     """
     This function extracts initial data from a PDF document
     containing examination results.
 
     Parameters:
     content (bytes): The content of the PDF document as bytes.
+    max_workers (int): The maximum number of processes used to extract the
+    pages in parallel. See get_initial_data.
+    engine (str): The extraction engine. See get_initial_data.
 
     Returns:
     DataFrame: A pandas DataFrame containing the extracted data.
@@ -384,7 +579,33 @@ def get_df_from_pdf_exam(content: bytes) -> DataFrame:
     additional columns for lower limit, upper limit, and unit of measurement.
     """
     logger.info("Getting initial data")
-    df = get_initial_data(content)
+    df = get_initial_data(content, max_workers=max_workers, engine=engine)
     logger.info("Treating dataframe")
-    trata_e_extrai_limites(df)
+    timing.count("rows", len(df))
+    with timing.stage("trata_e_extrai_limites"):
+        trata_e_extrai_limites(df)
     return df
+
+
+def get_document_from_pdf_exam(
+    content: bytes, max_workers: int = 1, engine: str = ENGINES[0]
+) -> ExamDocument:
+    """
+    This function parses a PDF document containing examination results into
+    the column-oriented document that is saved to Firestore.
+
+    Parameters:
+    content (bytes): The content of the PDF document as bytes.
+    max_workers (int): The maximum number of processes used to extract the
+    pages in parallel. See get_initial_data.
+    engine (str): The extraction engine. See get_initial_data.
+
+    Returns:
+    ExamDocument: A dict with one list of values per column of the DataFrame
+    returned by get_df_from_pdf_exam.
+    """
+    df = get_df_from_pdf_exam(content, max_workers=max_workers, engine=engine)
+    with timing.stage("to_document"):
+        df = df.reset_index(drop=True)
+        document: ExamDocument = df.to_dict(orient="list")
+    return document
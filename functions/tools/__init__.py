@@ -0,0 +1 @@
+"""Offline maintenance commands for the stored exams (not deployed)."""
@@ -0,0 +1,116 @@
+"""
+Exports the exams of one or more users as an Arrow IPC stream or a Parquet
+file (see src.export), written while the exams are read. --source analytes
+exports the per-analyte time series instead of the stored reports.
+
+Firestore is the project of the credentials, or the emulator when
+FIRESTORE_EMULATOR_HOST is set. With --pdf-dir, the exams come instead from
+the PDFs in <dir>/{uid}/*.pdf, parsed into an in-memory Firestore, and all
+the users found there are exported unless --uid is given.
+
+Usage (from the functions directory):
+    python -m tools.export --uid <uid> [<uid> ...] --output exams.parquet
+    python -m tools.export --pdf-dir ./laudos --format arrow --output exams.arrows
+"""
+
+import argparse
+import contextlib
+import os
+import resource
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+from src.export import (
+    EXPORT_BATCH_DOCUMENTS,
+    EXPORT_BATCH_ROWS,
+    EXPORT_FORMATS,
+    EXPORT_SOURCES,
+    exporta,
+)
+from src.local import InMemoryFirestore
+
+from tools.reprocess import conecta
+
+
+def carrega_pdfs(directory: str | Path) -> tuple[InMemoryFirestore, list[str]]:
+    """
+    This function parses the PDFs in <directory>/{uid}/*.pdf into the exams
+    of an in-memory Firestore, as send_exam would store them.
+
+    Returns:
+    tuple[InMemoryFirestore, list[str]]: The client and the uids found.
+    """
+    from src.resumo import atualiza_leitura
+    from src.utils import get_document_from_pdf_exam
+
+    client = InMemoryFirestore()
+    uids = []
+    for user in sorted(p for p in Path(directory).iterdir() if p.is_dir()):
+        uids.append(user.name)
+        for pdf in sorted(user.glob("*.pdf")):
+            document = get_document_from_pdf_exam(pdf.read_bytes())
+            client.collection(f"users/{user.name}/exams").document(pdf.stem).set(
+                document
+            )
+            atualiza_leitura(client, user.name, [document])
+    return client, uids
+
+
+def run() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--uid", nargs="+", help="the users to export")
+    parser.add_argument("--pdf-dir", help="export PDFs parsed in memory instead")
+    parser.add_argument("--credentials", default="./serviceAccountKey.json")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default=EXPORT_FORMATS[0])
+    parser.add_argument("--source", choices=EXPORT_SOURCES, default=EXPORT_SOURCES[0])
+    parser.add_argument("--batch-documents", type=int, default=EXPORT_BATCH_DOCUMENTS)
+    parser.add_argument("--batch-rows", type=int, default=EXPORT_BATCH_ROWS)
+    parser.add_argument("--output", required=True, help="file to write, - for stdout")
+    args = parser.parse_args()
+
+    client: Any
+    stdout = sys.stdout.buffer  # os logs do parser vão para /dev/null
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        if args.pdf_dir:
+            client, uids = carrega_pdfs(args.pdf_dir)
+            uids = args.uid or uids
+        elif args.uid:
+            client, _ = conecta(args.credentials, None)
+            uids = args.uid
+        else:
+            parser.error("--uid is required without --pdf-dir")
+
+        start = time.perf_counter()
+        size = 0
+        with contextlib.ExitStack() as stack:
+            if args.output == "-":
+                output = stdout
+            else:
+                output = stack.enter_context(open(args.output, "wb"))
+            chunks = exporta(
+                client,
+                uids,
+                args.format,
+                args.batch_documents,
+                args.source,
+                args.batch_rows,
+            )
+            for chunk in chunks:
+                output.write(chunk)
+                size += len(chunk)
+        elapsed = time.perf_counter() - start
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(
+        f"Exported {len(uids)} users to {args.output}: {size / 1e6:.2f} MB "
+        f"in {elapsed:.2f}s, peak memory {peak:.0f} MB",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    run()
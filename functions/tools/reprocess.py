@@ -0,0 +1,399 @@
+"""
+Re-parses the stored source PDFs of the exams after a parser fix (e.g. in
+mapeia_valores_referencia or trata_colunas_iniciais), so that existing exam
+documents get the new parse without users having to upload them again.
+
+The sources are the raw PDFs kept by send_exam_async, read from the bucket
+or from a local directory that mirrors it (<dir>/exam_uploads/{uid}/
+{job_id}.pdf, e.g. a `gsutil -m cp -r gs://<bucket>/exam_uploads <dir>`).
+Each PDF is mapped to its exam through the exam_id of its job and parsed
+in a process pool. The documents whose parse changed are rewritten (in the
+layout they were stored in) with one batched write per batch, their new
+values replace the old ones in the analyte series and the summary of each
+user and the progress is checkpointed, so running the same command again
+after an interruption resumes where it stopped. With --dry-run nothing is
+written and the changes are only reported.
+
+Firestore is the project of the credentials, or the emulator when
+FIRESTORE_EMULATOR_HOST is set.
+
+Usage (from the functions directory):
+    python -m tools.reprocess --bucket <bucket> [--workers N] [--dry-run]
+    python -m tools.reprocess --source-dir <dir> --dry-run --diff-output diff.jsonl
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from itertools import zip_longest
+from multiprocessing import get_context
+from pathlib import Path
+from typing import IO, Any, Protocol
+
+from src import timing
+from src.batch import FIRESTORE_BATCH_LIMIT
+from src.compact import SCHEMA_FIELD, codifica_documento, decodifica_documento
+from src.documents import ENGINES, PARSER_VERSION, ExamDocument
+from src.jobs import UPLOADS_PREFIX, job_ref, le_caminho_do_upload
+from src.pool import processa_no_worker
+from src.resumo import atualiza_leitura, para_json
+
+CHECKPOINT = "reprocess.checkpoint.json"
+BATCH_SIZE = 100
+DIFF_SAMPLE = 5  # células diferentes mostradas por documento
+
+
+class Fonte(Protocol):
+    def lista(self) -> list[str]: ...
+
+    def le(self, path: str) -> bytes: ...
+
+
+class FonteLocal:
+    """Source PDFs in a local directory laid out like the bucket."""
+
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory)
+
+    def lista(self) -> list[str]:
+        return sorted(
+            p.relative_to(self.directory).as_posix()
+            for p in (self.directory / UPLOADS_PREFIX).rglob("*.pdf")
+        )
+
+    def le(self, path: str) -> bytes:
+        return (self.directory / path).read_bytes()
+
+
+class FonteStorage:
+    """Source PDFs in the Storage bucket (or an in-memory stand-in)."""
+
+    def __init__(self, bucket: Any) -> None:
+        self.bucket = bucket
+
+    def lista(self) -> list[str]:
+        return sorted(
+            blob.name for blob in self.bucket.list_blobs(prefix=UPLOADS_PREFIX + "/")
+        )
+
+    def le(self, path: str) -> bytes:
+        data: bytes = self.bucket.blob(path).download_as_bytes()
+        return data
+
+
+@dataclass
+class Progresso:
+    processed: int = 0
+    changed: int = 0
+    unchanged: int = 0
+    failed: int = 0
+    orphans: int = 0  # sem job, sem exam_id ou com o exame apagado
+    skipped: int = 0  # já feitos antes ou fora do padrão {uid}/{job_id}.pdf
+
+
+def le_checkpoint(path: str, engine: str, saida: IO[str] | None = None) -> set[str]:
+    """
+    Returns the source paths already done by an earlier run, or an empty set
+    when there is no checkpoint or it was made by another parser version or
+    engine, whose results the current parser must redo (reported to saida).
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if (checkpoint.get("parser_version"), checkpoint.get("engine")) != (
+        PARSER_VERSION,
+        engine,
+    ):
+        print(
+            f"Ignoring {path}: made by another parser version or engine, "
+            "reprocessing all the sources",
+            file=saida,
+        )
+        return set()
+    return set(checkpoint.get("done", []))
+
+
+def grava_checkpoint(path: str, done: set[str], engine: str) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(
+            {"parser_version": PARSER_VERSION, "engine": engine, "done": sorted(done)},
+            f,
+        )
+    os.replace(tmp, path)  # nunca deixa um checkpoint pela metade
+
+
+def diferencas(antigo: ExamDocument, novo: ExamDocument) -> dict[str, Any]:
+    """
+    This function compares a stored exam with its new parse, cell by cell,
+    with dates compared by day and NaN equal to a missing value.
+
+    Returns:
+    dict[str, Any]: The added and removed columns, the row counts before
+    and after, the number of cells that differ and a sample of them.
+    """
+    a, b = para_json(antigo), para_json(novo)
+    diff: dict[str, Any] = {
+        "columns_added": [c for c in b if c not in a],
+        "columns_removed": [c for c in a if c not in b],
+        "rows": [len(next(iter(a.values()), [])), len(next(iter(b.values()), []))],
+        "cells": 0,
+        "sample": [],
+    }
+    for column in (c for c in b if c in a):
+        for row, (old, new) in enumerate(zip_longest(a[column], b[column])):
+            if old != new:
+                diff["cells"] += 1
+                if len(diff["sample"]) < DIFF_SAMPLE:
+                    diff["sample"].append(
+                        {"column": column, "row": row, "old": old, "new": new}
+                    )
+    return diff
+
+
+def mudou(diff: dict[str, Any]) -> bool:
+    return bool(
+        diff["columns_added"]
+        or diff["columns_removed"]
+        or diff["cells"]
+        or diff["rows"][0] != diff["rows"][1]
+    )
+
+
+def _silencia() -> None:
+    # os logs de cada página dos workers poluiriam a saída do comando
+    sys.stdout = open(os.devnull, "w")  # noqa: SIM115
+
+
+def processa_lote(
+    client: Any,
+    fonte: Fonte,
+    pool: ProcessPoolExecutor,
+    paths: list[str],
+    progresso: Progresso,
+    engine: str = ENGINES[0],
+    dry_run: bool = False,
+    saida: IO[str] | None = None,
+    diffs: IO[str] | None = None,
+) -> list[str]:
+    """
+    This function reprocesses one batch of source PDFs: resolves their
+    exams, parses them in the pool, compares each new parse with the stored
+    document and, unless dry_run, rewrites the changed ones in a single
+    batched write and updates the summaries of their users. Objects that
+    are not {uid}/{job_id}.pdf uploads are counted as skipped.
+
+    Returns:
+    list[str]: The source paths done, i.e. all but the failed ones.
+    """
+    uploads = [le_caminho_do_upload(path) for path in paths]
+    refs = [job_ref(client, *upload) if upload else None for upload in uploads]
+    with timing.stage("firestore_read"):
+        jobs = {
+            s.reference.path: s.to_dict() or {}
+            for s in client.get_all([ref for ref in refs if ref is not None])
+        }
+
+    alvos = []  # (caminho do PDF, uid, referência do exame)
+    for path, upload, ref in zip(paths, uploads, refs, strict=True):
+        if upload is None or ref is None:
+            progresso.skipped += 1
+            continue
+        exam_id = jobs.get(ref.path, {}).get("exam_id")
+        if exam_id is None:
+            progresso.orphans += 1
+            continue
+        uid = upload[0]
+        alvos.append(
+            (path, uid, client.collection(f"users/{uid}/exams").document(exam_id))
+        )
+
+    futures = []
+    for path, _, _ in alvos:
+        with timing.stage("storage_read"):
+            content = fonte.le(path)
+        timing.count("bytes", len(content))
+        futures.append(pool.submit(processa_no_worker, content, engine))
+    with timing.stage("firestore_read"):
+        existentes = {
+            s.reference.path: s.to_dict()
+            for s in client.get_all([ref for _, _, ref in alvos])
+            if s.exists
+        }
+
+    done = [path for path in paths if path not in {a[0] for a in alvos}]
+    writes = []
+    por_usuario: dict[str, list[ExamDocument]] = defaultdict(list)
+    for (path, uid, ref), future in zip(alvos, futures, strict=True):
+        try:
+            document, worker_trace = future.result()
+        except Exception as e:
+            progresso.failed += 1
+            print(f"{path}: failed: {e}", file=saida)
+            continue  # fica fora do checkpoint e é tentado de novo
+        timing.merge(worker_trace)
+        progresso.processed += 1
+        done.append(path)
+        antigo = existentes.get(ref.path)
+        if antigo is None:
+            progresso.orphans += 1
+            continue
+        diff = diferencas(decodifica_documento(antigo), document)
+        if not mudou(diff):
+            progresso.unchanged += 1
+            continue
+        progresso.changed += 1
+        print(
+            f"{path} -> {ref.path}: rows {diff['rows'][0]} -> {diff['rows'][1]}, "
+            f"{diff['cells']} cells changed, columns +{diff['columns_added']} "
+            f"-{diff['columns_removed']}",
+            file=saida,
+        )
+        if diffs is not None:
+            diffs.write(json.dumps({"source": path, "exam": ref.path, **diff}) + "\n")
+        stored = codifica_documento(document) if SCHEMA_FIELD in antigo else document
+        writes.append((ref, stored))
+        por_usuario[uid].append(document)
+
+    if writes and not dry_run:
+        with timing.stage("firestore_write"):
+            batch = client.batch()
+            for ref, stored in writes:
+                batch.set(ref, stored)
+            batch.commit()
+        with timing.stage("summary_write"):
+            for uid, documents in por_usuario.items():
+                atualiza_leitura(client, uid, documents, sobrescreve=True)
+    return done
+
+
+def reprocessa(
+    client: Any,
+    fonte: Fonte,
+    workers: int | None = None,
+    engine: str = ENGINES[0],
+    batch_size: int = BATCH_SIZE,
+    checkpoint: str | None = CHECKPOINT,
+    dry_run: bool = False,
+    saida: IO[str] | None = None,
+    diffs: IO[str] | None = None,
+) -> tuple[Progresso, timing.Trace]:
+    """
+    This function reprocesses all the source PDFs not done yet by an
+    earlier run, batch_size at a time, checkpointing after each batch.
+    A dry run neither reads nor writes the checkpoint.
+
+    Returns:
+    tuple[Progresso, timing.Trace]: The counts and the stage timings, the
+    ones of the workers summed over all of them.
+    """
+    batch_size = min(batch_size, FIRESTORE_BATCH_LIMIT)
+    paths = fonte.lista()
+    if dry_run or checkpoint is None:
+        done = set()
+    else:
+        done = le_checkpoint(checkpoint, engine, saida)
+    pendentes = [path for path in paths if path not in done]
+    progresso = Progresso(skipped=len(paths) - len(pendentes))
+    with (
+        timing.tracing("reprocess", emit=False) as trace,
+        ProcessPoolExecutor(
+            workers, mp_context=get_context("spawn"), initializer=_silencia
+        ) as pool,
+    ):
+        for start in range(0, len(pendentes), batch_size):
+            lote = pendentes[start : start + batch_size]
+            done.update(
+                processa_lote(
+                    client, fonte, pool, lote, progresso, engine, dry_run, saida, diffs
+                )
+            )
+            if checkpoint is not None and not dry_run:
+                grava_checkpoint(checkpoint, done, engine)
+            print(
+                f"{start + len(lote)}/{len(pendentes)} sources, "
+                f"{progresso.changed} changed",
+                file=saida,
+            )
+    return progresso, trace
+
+
+def conecta(credentials_path: str, bucket: str | None) -> tuple[Any, Any]:
+    """Initializes the Admin SDK and returns the Firestore client and bucket."""
+    import firebase_admin
+    from firebase_admin import credentials, firestore, storage
+
+    if os.path.exists(credentials_path):
+        cred = credentials.Certificate(credentials_path)
+    else:
+        cred = credentials.ApplicationDefault()
+    app = firebase_admin.initialize_app(
+        cred, {"storageBucket": bucket} if bucket else None
+    )
+    return firestore.client(app), storage.bucket(app=app) if bucket else None
+
+
+def run() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--bucket", help="read the PDFs from this bucket")
+    source.add_argument("--source-dir", help="read the PDFs from a local mirror")
+    parser.add_argument("--credentials", default="./serviceAccountKey.json")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--engine", choices=ENGINES, default=ENGINES[0])
+    parser.add_argument("--checkpoint", default=CHECKPOINT)
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint")
+    parser.add_argument("--dry-run", action="store_true", help="only report changes")
+    parser.add_argument("--diff-output", help="write the changes as JSON lines")
+    parser.add_argument("--verbose", action="store_true", help="show the logs")
+    args = parser.parse_args()
+
+    client, bucket = conecta(args.credentials, args.bucket)
+    fonte: Fonte = FonteStorage(bucket) if args.bucket else FonteLocal(args.source_dir)
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    saida = sys.stdout
+    start = time.perf_counter()
+    with contextlib.ExitStack() as stack:
+        diffs = (
+            stack.enter_context(open(args.diff_output, "w"))
+            if args.diff_output
+            else None
+        )
+        if not args.verbose:
+            devnull = stack.enter_context(open(os.devnull, "w"))
+            stack.enter_context(contextlib.redirect_stdout(devnull))
+        progresso, trace = reprocessa(
+            client,
+            fonte,
+            workers=args.workers,
+            engine=args.engine,
+            batch_size=args.batch_size,
+            checkpoint=args.checkpoint,
+            dry_run=args.dry_run,
+            saida=saida,
+            diffs=diffs,
+        )
+    elapsed = time.perf_counter() - start
+
+    rate = progresso.processed / elapsed if elapsed else 0.0
+    print(f"{asdict(progresso)}{' (dry run)' if args.dry_run else ''}")
+    print(f"{progresso.processed} documents in {elapsed:.1f}s: {rate:.2f} docs/s")
+    print("stage times (s, workers summed):")
+    for stage, ms in sorted(trace.stages_ms.items(), key=lambda item: -item[1]):
+        print(f"  {stage:<32} {ms / 1000:>9.2f}")
+
+
+if __name__ == "__main__":
+    run()